@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+###############################################################################
+# Copyright 2015 University of Florida. All rights reserved.
+# This file is part of the BlueButton.py project.
+# Use of this source code is governed by the license found in the LICENSE file.
+###############################################################################
+
+"""
+Compares parse times of the XML backends and checks that they agree.
+
+Usage:
+    python benchmarks/backends.py [-n REPEAT] FILE [FILE ...]
+"""
+
+import argparse
+import time
+
+import bluebutton
+from bluebutton.core import xml
+
+
+def time_parse(source, backend, repeat):
+    best, data = None, None
+    for _ in range(repeat):
+        start = time.time()
+        data = bluebutton.BlueButton(source, {'backend': backend}).data
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, data.json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-n', '--repeat', type=int, default=3)
+    parser.add_argument('files', nargs='+')
+    args = parser.parse_args()
+
+    backends = [name for name in sorted(xml.BACKENDS)
+                if name != 'lxml' or xml.lxml_etree is not None]
+
+    print '%-40s %s' % ('file', ' '.join('%10s' % b for b in backends))
+    for path in args.files:
+        with open(path) as fp:
+            source = fp.read()
+
+        timings, outputs = [], set()
+        for backend in backends:
+            elapsed, output = time_parse(source, backend, args.repeat)
+            timings.append(elapsed)
+            outputs.add(output)
+
+        print '%-40s %s%s' % (path[-40:],
+                              ' '.join('%9.3fs' % t for t in timings),
+                              '' if len(outputs) == 1 else '  OUTPUT DIFFERS')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+###############################################################################
+# Copyright 2015 University of Florida. All rights reserved.
+# This file is part of the BlueButton.py project.
+# Use of this source code is governed by the license found in the LICENSE file.
+###############################################################################
+
+"""
+Shows the memory that interning coded attribute values saves a process that
+keeps many parsed documents around.
+
+Each file is parsed REPEAT times and every result is kept, once without and
+once with interning (in separate processes, so that each gets its own peak
+RSS).
+
+Usage:
+    python benchmarks/interning.py [-n REPEAT] FILE [FILE ...]
+"""
+
+import argparse
+import multiprocessing
+import resource
+
+import bluebutton
+from bluebutton.core import interning
+
+
+def keep_parsed(args):
+    paths, repeat, intern = args
+    if intern:
+        interning.enable()
+
+    kept = []
+    for path in paths:
+        with open(path) as fp:
+            source = fp.read()
+        for _ in range(repeat):
+            kept.append(bluebutton.BlueButton(source).data.evaluate())
+
+    pool = interning.get_pool()
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            pool.stats() if pool is not None else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-n', '--repeat', type=int, default=10)
+    parser.add_argument('files', nargs='+')
+    args = parser.parse_args()
+
+    for intern in (False, True):
+        # a fresh process per run, so that peak RSS isn't shared
+        workers = multiprocessing.Pool(1, maxtasksperchild=1)
+        rss, stats = workers.apply(keep_parsed,
+                                   ((args.files, args.repeat, intern),))
+        workers.close()
+        workers.join()
+
+        print '%-14s peak RSS %8.1f MB' % (
+            'interning' if intern else 'no interning', rss / 1024.0)
+        if stats:
+            print '%14s %d values (%.1f KB), %d hits, %d misses, ' \
+                  '%.1f MB of copies saved' % (
+                      '', stats['values'], stats['bytes'] / 1024.0,
+                      stats['hits'], stats['misses'],
+                      stats['bytes_saved'] / 1024.0 / 1024)
+
+
+if __name__ == '__main__':
+    main()
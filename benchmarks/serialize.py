@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+###############################################################################
+# Copyright 2015 University of Florida. All rights reserved.
+# This file is part of the BlueButton.py project.
+# Use of this source code is governed by the license found in the LICENSE file.
+###############################################################################
+
+"""
+Compares serializing parsed documents with JSONEncoder and with
+wrappers.dumps(), and checks that they agree.
+
+Usage:
+    python benchmarks/serialize.py [-n REPEAT] FILE [FILE ...]
+"""
+
+import argparse
+import json
+import time
+
+import bluebutton
+from bluebutton.core import wrappers
+
+
+def time_dumps(dumps, data, repeat):
+    best, output = None, None
+    for _ in range(repeat):
+        start = time.time()
+        output = dumps(data)
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('-n', '--repeat', type=int, default=3)
+    parser.add_argument('files', nargs='+')
+    args = parser.parse_args()
+
+    print '%-40s %10s %10s %8s' % ('file', 'encoder', 'dumps', 'speedup')
+    for path in args.files:
+        with open(path) as fp:
+            data = bluebutton.BlueButton(fp.read()).data.evaluate()
+
+        encoder_time, expected = time_dumps(
+            lambda o: json.dumps(o, cls=wrappers.JSONEncoder), data,
+            args.repeat)
+        dumps_time, output = time_dumps(wrappers.dumps, data, args.repeat)
+
+        print '%-40s %9.3fs %9.3fs %7.1fx%s' % (
+            path[-40:], encoder_time, dumps_time, encoder_time / dumps_time,
+            '' if output == expected else '  OUTPUT DIFFERS')
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,13 @@ from . import core
 from . import documents
 import documents.ccda
 import parsers.ccda
+from .batch import parse_many, ParseResult
+from . import cache
+from . import columnar
+from .core import wrappers
+
+
+__version__ = '0.4.2.post0'
 
 
 def bomstrip(string):
@@ -31,14 +38,76 @@ def bomstrip(string):
 
 
 class BlueButton(object):
+    """
+    Parses a health document.
+
+    Supported options:
+      parser   - a callable returning the parsed document, bypassing
+                 detection
+      backend  - the XML backend to parse with: 'etree' (the default),
+                 'lxml' (faster, if it is installed) or a backend instance
+                 (see core.xml.BACKENDS)
+      stream   - parse a CCDA one section at a time without keeping the
+                 document in memory (see parsers.ccda.run_stream); `source`
+                 may then also be a file-like object, and `source` is None
+                 on the result
+      sections - a list of the fields of `data` to parse (see
+                 parsers.ccda.FIELDS), e.g. ['problems', 'allergies'];
+                 the other sections are skipped
+      cache    - a cache.DiskCache (or the directory of one) or a
+                 cache.MemoryCache to load the parsed document from if it
+                 has been parsed before, and to store it in otherwise. The
+                 store parses every section (or every one of `sections`)
+                 straight away, so a miss costs a full parse even if only
+                 some sections are then used. On a hit, `source` is None on
+                 the result, and with a MemoryCache its sections are shared
+                 with the other hits and can't be changed. Only used for
+                 string sources without a `parser` option.
+      previous - an earlier BlueButton of (an older version of) the same
+                 document: sections that haven't changed since are taken
+                 from its data rather than parsed again (see
+                 parsers.ccda.run_incremental). Ignored if it wasn't parsed
+                 from a CCDA's XML, or was loaded from a cache or streamed.
+
+    `source` may also be the JSON that data.json() returned for a CCDA,
+    which is loaded back (with type 'json') rather than parsed.
+    """
+    # the hashes of the document's sections, once an update has needed them
+    _digests = None
+
     def __init__(self, source, options=None):
         type, parsed_document, parsed_data = None, None, None
 
-        if options is None:
-            opts = dict()
+        opts = options if options is not None else dict()
+
+        document_cache, cache_key = opts.get('cache'), None
+        if document_cache is not None and 'parser' not in opts and \
+                isinstance(source, basestring):
+            if isinstance(document_cache, basestring):
+                document_cache = cache.DiskCache(document_cache)
+            source = bomstrip(source)
+            cache_key = cache.key(source, __version__, opts.get('sections'))
+            cached = document_cache.get(cache_key)
+            if cached is not None:
+                if isinstance(document_cache, cache.DiskCache):
+                    self.type = 'ccda'
+                    self.data = parsers.ccda.run_json(cached)
+                else:
+                    self.type, fields = cached
+                    self.data = parsers.ccda.load(fields)
+                self.source = None
+                return
+
+        if opts.get('stream'):
+            self.type = 'ccda'
+            self.data = parsers.ccda.run_stream(source, opts.get('backend'),
+                                                opts.get('sections'))
+            self.source = None
+            self._store(document_cache, cache_key, opts)
+            return
 
         source = bomstrip(source)
-        parsed_data = core.parse_data(source)
+        parsed_data = core.parse_data(source, opts.get('backend'))
 
         if 'parser' in opts:
             parsed_document = opts['parser']()
@@ -52,11 +121,63 @@ class BlueButton(object):
                 pass
             elif 'ccda' == type:
                 parsed_data = documents.ccda.process(parsed_data)
-                parsed_document = parsers.ccda.run(parsed_data)
-            elif 'json' == type:
-                # TODO: add support for JSON
-                pass
+                previous = opts.get('previous')
+                if previous is not None and 'ccda' == previous.type and \
+                        previous.source is not None:
+                    parsed_document, self._digests = \
+                        parsers.ccda.run_incremental(
+                            parsed_data, previous.data,
+                            previous._section_digests(opts.get('sections')),
+                            opts.get('sections'))
+                else:
+                    parsed_document = parsers.ccda.run(parsed_data,
+                                                       opts.get('sections'))
+            elif 'json' == type and isinstance(parsed_data, dict):
+                # (detect() also says 'json' when the XML didn't parse)
+                parsed_document = parsers.ccda.run_json(parsed_data)
 
         self.type = type
         self.data = parsed_document
         self.source = parsed_data
+        self._store(document_cache, cache_key, opts)
+
+    def _section_digests(self, sections):
+        if self._digests is None:
+            self._digests = parsers.ccda.digests(self.source, sections)
+        return self._digests
+
+    def _store(self, document_cache, cache_key, opts):
+        if cache_key is None or 'ccda' != self.type:
+            return
+        if isinstance(document_cache, cache.DiskCache):
+            document_cache.put(cache_key, self.data.json())
+            return
+        document_cache.put(cache_key, (self.type, [
+            (field, getattr(self.data, field))
+            for field in parsers.ccda.select(opts.get('sections'))]))
+
+    def dump(self, fp, format='json', document_id=None):
+        """
+        Writes the parsed document to the file-like object `fp` a section at
+        a time, as the JSON that data.json() returns (format='json') or as
+        a line of JSON per entry, tagged with its section and `document_id`
+        (format='ndjson'; see core.wrappers.dump_ndjson)
+        """
+        if 'json' == format:
+            wrappers.dump(self.data, fp)
+        elif 'ndjson' == format:
+            wrappers.dump_ndjson(self.data, fp, document_id)
+        else:
+            raise ValueError("Unknown format %r, expected 'json' or 'ndjson'"
+                             % format)
+
+    def columns(self, section):
+        """
+        Returns `section` of the parsed document ('results' or 'vitals') as
+        a NumPy structured array with a row per observation (see columnar).
+        Requires numpy.
+        """
+        if section not in columnar.SECTIONS:
+            raise ValueError('No columnar view of %r (expected one of: %s)'
+                             % (section, ', '.join(sorted(columnar.SECTIONS))))
+        return columnar.SECTIONS[section](self.data)
@@ -0,0 +1,174 @@
+###############################################################################
+# Copyright 2015 University of Florida. All rights reserved.
+# This file is part of the BlueButton.py project.
+# Use of this source code is governed by the license found in the LICENSE file.
+###############################################################################
+
+"""
+Parsing of many documents at once over a pool of worker processes
+"""
+
+import collections
+import itertools
+import json
+import multiprocessing
+import Queue
+import time
+import zipfile
+
+import bluebutton
+
+
+class ParseResult(collections.namedtuple(
+        'ParseResult',
+        ['index', 'path', 'type', 'data', 'error', 'size', 'seconds'])):
+    """
+    The outcome of parsing one document: its position in the input, the path
+    it was read from ('<zip file path>!<member>' for zip members, None for
+    in-memory sources), the document type and the parsed data as plain dicts
+    and lists (as loaded from BlueButton's JSON), or None and a description
+    of the error if it couldn't be parsed. Also the size of the document in
+    bytes and the time it took to read and parse.
+    """
+    __slots__ = ()
+
+
+def parse_many(sources, workers=None, chunksize=1, ordered=True,
+               options=None, as_json=False):
+    """
+    Parses each of `sources` with BlueButton, yielding a ParseResult per
+    document.
+
+    `sources` is any iterable of file paths, (zip file path, member name)
+    pairs and/or document contents (a string starting with '<' or '{' is
+    taken to be a document; anything else a path). It is consumed as
+    results come back, with no more than two chunks per worker handed out
+    at a time, so a generator of any length is fine. Sources should be
+    paths, though: they're read by the workers, so they're cheaper to send
+    and only the documents being parsed are in memory.
+
+    workers   - number of worker processes; defaults to the number of CPUs,
+                and 1 parses in this process without a pool
+    chunksize - number of documents handed to a worker at a time
+    ordered   - yield results in input order; otherwise as they complete
+    options   - passed on to BlueButton (they must be picklable)
+    as_json   - leave the data as the JSON text from BlueButton.data.json()
+
+    A document that fails to parse yields a result with its error rather than
+    stopping the batch.
+    """
+    tasks = ((index, source, options, as_json)
+             for index, source in enumerate(sources))
+
+    if workers == 1:
+        for task in tasks:
+            yield _parse_one(task)
+        return
+
+    workers = workers or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(workers)
+    try:
+        # Pool.imap() would read all of `tasks` ahead of the workers
+        chunks = iter(lambda: list(itertools.islice(tasks, chunksize)), [])
+        run = _run_ordered if ordered else _run_unordered
+        for results in run(pool, chunks, 2 * workers):
+            for result in results:
+                yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _run_ordered(pool, chunks, window):
+    # yields each chunk's results in input order, with up to `window`
+    # chunks submitted at a time
+    pending = collections.deque()
+    for chunk in itertools.islice(chunks, window):
+        pending.append(pool.apply_async(_parse_chunk, (chunk,)))
+
+    while pending:
+        results = pending.popleft().get()
+        for chunk in itertools.islice(chunks, 1):
+            pending.append(pool.apply_async(_parse_chunk, (chunk,)))
+        yield results
+
+
+def _run_unordered(pool, chunks, window):
+    # likewise, as the chunks complete
+    done = Queue.Queue()
+    pending = []
+
+    def submit(count):
+        submitted = 0
+        for chunk in itertools.islice(chunks, count):
+            pending.append(pool.apply_async(_parse_chunk, (chunk,),
+                                            callback=done.put))
+            submitted += 1
+        return submitted
+
+    outstanding = submit(window)
+    while outstanding:
+        try:
+            # with a timeout, so that it can be interrupted
+            results = done.get(timeout=0.1)
+        except Queue.Empty:
+            for async_result in pending:
+                if async_result.ready() and not async_result.successful():
+                    # the callback isn't called for a failed chunk
+                    async_result.get()
+            continue
+
+        pending[:] = [r for r in pending if not r.ready()]
+        outstanding += submit(1) - 1
+        yield results
+
+
+def _parse_chunk(tasks):
+    return [_parse_one(task) for task in tasks]
+
+
+def _parse_one(task):
+    index, source, options, as_json = task
+    opts = dict(options or {})
+
+    start = time.time()
+    path, size = None, None
+    try:
+        if isinstance(source, tuple):
+            path = '%s!%s' % source
+            archive = zipfile.ZipFile(source[0])
+            try:
+                source = archive.read(source[1])
+            finally:
+                archive.close()
+        elif not _is_document(source):
+            path = source
+            with open(path, 'rb') as fp:
+                source = fp.read()
+        size = len(source)
+
+        bb = bluebutton.BlueButton(source, opts)
+        if bb.data is None:
+            # a C32, or XML that isn't a known type or isn't well-formed
+            if bb.source is None:
+                error = 'not a well-formed document'
+            else:
+                error = 'unsupported document type %r' % (bb.type,)
+            return ParseResult(index, path, bb.type, None, error, size,
+                               time.time() - start)
+
+        data = bb.data.json()
+        if not as_json:
+            data = json.loads(data)
+        return ParseResult(index, path, bb.type, data, None, size,
+                           time.time() - start)
+    except Exception as e:
+        return ParseResult(index, path, None, None,
+                           '%s: %s' % (type(e).__name__, e), size,
+                           time.time() - start)
+
+
+def _is_document(source):
+    start = bluebutton.bomstrip(source[:64]).lstrip()
+    return start.startswith('<') or start.startswith('{')
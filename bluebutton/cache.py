@@ -0,0 +1,297 @@
+###############################################################################
+# Copyright 2015 University of Florida. All rights reserved.
+# This file is part of the BlueButton.py project.
+# Use of this source code is governed by the license found in the LICENSE file.
+###############################################################################
+
+"""
+Caches of parsed documents: on disk, shared by any number of processes, and
+in memory, shared by a process's threads.
+
+Entries are keyed by a hash of the document and of the library version, so
+a document that arrives again (re-sent, re-queried or retried) is loaded
+back instead of parsed, and an upgrade never reuses stale results. The
+least recently used entries are removed once the cache outgrows its size
+limit.
+
+    cache = DiskCache('/var/cache/bluebutton', max_bytes=2 * 1024 ** 3)
+    bb = BlueButton(source, {'cache': cache})
+"""
+
+from collections import OrderedDict
+import errno
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from .core import wrappers
+
+
+class DiskCache(object):
+    """
+    Keeps JSON documents as files in `directory`, one per key. JSON rather
+    than pickles, since loading a pickle can run any code, and whoever else
+    can write to the directory could plant one. Writes go to a temporary
+    file that is renamed into place, so readers never see a partial entry,
+    and an entry that can't be read is treated as missing.
+
+    Once the files add up to more than `max_bytes`, the least recently used
+    (by modification time, which reading an entry updates) are removed until
+    they're down to `low_water` of it. The total is rescanned from disk when
+    this process's count of it goes over, so with several processes writing
+    it is approximate.
+    """
+
+    def __init__(self, directory, max_bytes=1024 ** 3, low_water=0.9):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.low_water = low_water
+        self.hits = 0
+        self.misses = 0
+        # bytes in the cache, as of the last scan plus what was written since
+        self._size = None
+
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+    def get(self, key):
+        """
+        Returns the JSON stored under `key`, loaded (as json.loads returns
+        it), or None
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as fp:
+                value = json.load(fp)
+        except (IOError, OSError):
+            self.misses += 1
+            return None
+        except Exception:
+            # left behind by an older version or a crash: drop it
+            _remove(path)
+            self.misses += 1
+            return None
+
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    def put(self, key, text):
+        """
+        Stores `text`, a JSON document (such as data.json() returns), under
+        `key`
+        """
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(text)
+                size = fp.tell()
+            os.rename(temp_path, path)
+        except:
+            _remove(temp_path)
+            raise
+
+        if self._size is None:
+            self._size = self._scan_size()
+        else:
+            self._size += size
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache is below its
+        low water mark
+        """
+        entries = []
+        for path in self._files(stale_after=3600):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        size = sum(entry[1] for entry in entries)
+        target = self.max_bytes * self.low_water
+        for _, entry_size, path in sorted(entries):
+            if size <= target:
+                break
+            _remove(path)
+            size -= entry_size
+        self._size = size
+
+    def clear(self):
+        for path in self._files():
+            _remove(path)
+        self._size = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key[2:] + '.json')
+
+    def _files(self, stale_after=None):
+        # the entries' files, removing temporary files older than
+        # `stale_after` seconds (if given), which a crashed writer left
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                if filename.endswith('.json'):
+                    yield path
+                elif filename.endswith('.tmp') and stale_after is not None:
+                    try:
+                        if time.time() - os.path.getmtime(path) > stale_after:
+                            _remove(path)
+                    except OSError:
+                        pass
+
+    def _scan_size(self):
+        size = 0
+        for path in self._files():
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        return size
+
+
+class MemoryCache(object):
+    """
+    Keeps values in memory, for up to `max_entries` of them and (if given)
+    about `max_bytes` of them, evicting the least recently used first. It
+    can be used from any number of threads.
+
+    Values are frozen when they're stored (see core.wrappers.freeze), since
+    every get() of one returns the same objects: one user can't change what
+    the others see.
+    """
+
+    def __init__(self, max_entries=128, max_bytes=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # approximate bytes of the values held
+        self.size = 0
+        # key => (value, size), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns the value stored under `key`, or None
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries[key] = entry
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        """
+        Stores `value` under `key`
+        """
+        value = wrappers.freeze(value)
+        # measured outside the lock, as it walks the whole value
+        size = _sizeof(value, set())
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old[1]
+            self._entries[key] = (value, size)
+            self.size += size
+
+            while self._entries and (
+                    len(self._entries) > self.max_entries or
+                    self.max_bytes is not None and
+                    self.size > self.max_bytes):
+                _, (_, entry_size) = self._entries.popitem(last=False)
+                self.size -= entry_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        """
+        Returns the number of entries and their approximate bytes, and the
+        hits, misses and evictions so far
+        """
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def key(source, version, sections=None):
+    """
+    Returns the cache key of a document: a hash of its (BOM-stripped) source,
+    of the version of the library parsing it and of the sections parsed
+    """
+    digest = hashlib.sha256()
+    digest.update('%s\0%s\0%d\0' % (
+        version, ','.join(sorted(sections)) if sections is not None else '*',
+        sys.version_info[0]))
+    digest.update(source.encode('utf-8') if isinstance(source, unicode)
+                  else source)
+    return digest.hexdigest()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+
+
+def _sizeof(o, seen):
+    # approximate bytes of `o` and of what it holds, counting objects that
+    # appear more than once (such as records' shared empty instances) once
+    if id(o) in seen:
+        return 0
+    seen.add(id(o))
+
+    size = sys.getsizeof(o)
+    if isinstance(o, wrappers.Record):
+        for field in o._fields:
+            size += _sizeof(getattr(o, field), seen)
+    elif isinstance(o, (list, tuple)):
+        for item in o:
+            size += _sizeof(item, seen)
+    elif isinstance(o, dict):
+        for item in o.iteritems():
+            size += _sizeof(item, seen)
+    return size
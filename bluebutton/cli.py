@@ -0,0 +1,251 @@
+###############################################################################
+# Copyright 2015 University of Florida. All rights reserved.
+# This file is part of the BlueButton.py project.
+# Use of this source code is governed by the license found in the LICENSE file.
+###############################################################################
+
+"""
+bluebutton-convert: converts health documents to JSON in bulk.
+
+Inputs can be documents, directories (searched for *.xml), zip files (their
+*.xml members) or '-' for a document on stdin. Each document is written to
+its own .json file under the output directory, mirroring the input layout,
+or as one line of an NDJSON file:
+
+    {"source": "<input name>", "type": "ccda", "data": {...}}
+    {"source": "<input name>", "error": "<what went wrong>"}
+
+A throughput summary is printed to stderr at the end.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import zipfile
+
+from . import batch
+
+
+def main(argv=None):
+    parser = _argument_parser()
+    args = parser.parse_args(argv)
+
+    if args.format == 'json' and args.output is None and args.inputs != ['-']:
+        parser.error('the json format needs an output directory (-o)')
+    if args.format == 'ndjson' and args.resume and args.output is None:
+        parser.error('--resume with the ndjson format needs an output file')
+
+    options = {}
+    if args.backend:
+        options['backend'] = args.backend
+    if args.sections:
+        options['sections'] = args.sections.split(',')
+
+    if args.format == 'ndjson':
+        writer = _NdjsonWriter(args.output, args.resume)
+    else:
+        writer = _JsonWriter(args.output, args.resume)
+
+    stats = _Stats()
+    # only names and paths (bar stdin), so listed up front
+    documents = []
+    for name, relative_name, source in _inputs(args.inputs):
+        if writer.done(name, relative_name):
+            stats.skipped += 1
+        else:
+            documents.append((name, relative_name, source))
+
+    try:
+        sources = (source for _, _, source in documents)
+        for result in batch.parse_many(sources, workers=args.workers,
+                                       chunksize=args.chunksize,
+                                       ordered=False, options=options,
+                                       as_json=True):
+            name, relative_name, _ = documents[result.index]
+            stats.add(name, result)
+            if result.error:
+                sys.stderr.write('%s: %s\n' % (name, result.error))
+            writer.write(name, relative_name, result)
+    finally:
+        writer.close()
+
+    stats.report(sys.stderr, args.slowest)
+    return 1 if stats.errors else 0
+
+
+def _argument_parser():
+    parser = argparse.ArgumentParser(
+        prog='bluebutton-convert',
+        description=__doc__.strip().split('\n')[0].split(': ', 1)[1],
+        epilog='\n'.join(__doc__.strip().split('\n')[2:]),
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('inputs', nargs='+', metavar='INPUT',
+                        help="document, directory, zip file or '-' for stdin")
+    parser.add_argument('-f', '--format', choices=('json', 'ndjson'),
+                        default='json')
+    parser.add_argument('-o', '--output',
+                        help='output directory (json) or file (ndjson, '
+                             'default stdout)')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='worker processes (default: number of CPUs)')
+    parser.add_argument('--chunksize', type=int, default=1,
+                        help='documents handed to a worker at a time')
+    parser.add_argument('--resume', action='store_true',
+                        help='skip documents that already have output')
+    parser.add_argument('--backend',
+                        help="XML backend: 'etree' (default) or 'lxml'")
+    parser.add_argument('--sections',
+                        help='comma-separated sections to parse (default all)')
+    parser.add_argument('--slowest', type=int, default=5, metavar='N',
+                        help='number of slowest documents to report')
+    return parser
+
+
+def _inputs(inputs):
+    """
+    Yields (name, relative name, source) for each document, where source is
+    a path, a (zip file path, member name) pair for zip members (read by the
+    worker parsing them) or, for stdin, the document itself
+    """
+    for path in inputs:
+        if '-' == path:
+            yield '-', 'stdin', sys.stdin.read()
+        elif os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for filename in sorted(files):
+                    if filename.lower().endswith('.xml'):
+                        full_path = os.path.join(root, filename)
+                        yield (full_path, os.path.relpath(full_path, path),
+                               full_path)
+        elif zipfile.is_zipfile(path):
+            prefix = os.path.splitext(os.path.basename(path))[0]
+            archive = zipfile.ZipFile(path)
+            try:
+                for member in archive.namelist():
+                    if member.lower().endswith('.xml'):
+                        yield ('%s!%s' % (path, member),
+                               os.path.join(prefix, member),
+                               (path, member))
+            finally:
+                archive.close()
+        else:
+            yield path, os.path.basename(path), path
+
+
+class _JsonWriter(object):
+    """
+    Writes each document to its own .json file, or to stdout when there is no
+    output directory
+    """
+
+    def __init__(self, directory, resume):
+        self.directory = directory
+        self.resume = resume
+
+    def _path(self, relative_name):
+        return os.path.join(self.directory,
+                            os.path.splitext(relative_name)[0] + '.json')
+
+    def done(self, name, relative_name):
+        return bool(self.resume and self.directory and
+                    os.path.exists(self._path(relative_name)))
+
+    def write(self, name, relative_name, result):
+        if result.error:
+            return
+        if self.directory is None:
+            sys.stdout.write(result.data + '\n')
+            return
+
+        path = self._path(relative_name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        # written under a temporary name so that an interrupted run never
+        # leaves a partial file behind for --resume to trust
+        with open(path + '.tmp', 'w') as fp:
+            fp.write(result.data)
+        os.rename(path + '.tmp', path)
+
+    def close(self):
+        pass
+
+
+class _NdjsonWriter(object):
+    """
+    Writes a line per document to a file (appending to it when resuming) or
+    to stdout
+    """
+
+    def __init__(self, path, resume):
+        self.converted = set()
+        if path is None:
+            self.fp = sys.stdout
+            return
+
+        if resume and os.path.exists(path):
+            with open(path) as fp:
+                for line in fp:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # a line cut short by an interrupted run
+                        continue
+                    if 'data' in entry:
+                        self.converted.add(entry['source'])
+        self.fp = open(path, 'a' if resume else 'w')
+
+    def done(self, name, relative_name):
+        return name in self.converted
+
+    def write(self, name, relative_name, result):
+        if result.error:
+            self.fp.write('{"source": %s, "error": %s}\n'
+                          % (json.dumps(name), json.dumps(result.error)))
+        else:
+            self.fp.write('{"source": %s, "type": %s, "data": %s}\n'
+                          % (json.dumps(name), json.dumps(result.type),
+                             result.data))
+
+    def close(self):
+        if self.fp is not sys.stdout:
+            self.fp.close()
+        else:
+            self.fp.flush()
+
+
+class _Stats(object):
+
+    def __init__(self):
+        self.start = time.time()
+        self.converted = 0
+        self.errors = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.timings = []
+
+    def add(self, name, result):
+        if result.error:
+            self.errors += 1
+        else:
+            self.converted += 1
+        self.bytes += result.size or 0
+        self.timings.append((result.seconds, name))
+
+    def report(self, fp, slowest):
+        elapsed = max(time.time() - self.start, 1e-6)
+        documents = self.converted + self.errors
+        fp.write('%d converted, %d failed, %d skipped in %.1fs '
+                 '(%.1f docs/s, %.2f MB/s)\n'
+                 % (self.converted, self.errors, self.skipped, elapsed,
+                    documents / elapsed, self.bytes / elapsed / 1024 / 1024))
+        if slowest and self.timings:
+            fp.write('slowest:\n')
+            for seconds, name in sorted(self.timings, reverse=True)[:slowest]:
+                fp.write('  %8.3fs  %s\n' % (seconds, name))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,113 @@
+###############################################################################
+# Copyright 2015 University of Florida. All rights reserved.
+# This file is part of the BlueButton.py project.
+# Use of this source code is governed by the license found in the LICENSE file.
+###############################################################################
+
+"""
+Columnar views of the parsed lab results and vitals, as NumPy structured
+arrays with one row per observation. Requires numpy.
+
+Every array of a section has the same dtype (strings are object fields
+rather than fixed-width ones), so the arrays of many documents are joined
+with a single numpy.concatenate().
+"""
+
+import datetime
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .core import wrappers
+
+
+# Fields of the arrays: dates are datetime64[us] in UTC (NaT if missing) and
+# numbers are floats (NaN if missing or not numeric)
+FIELDS = [
+    ('date', 'datetime64[us]'),
+    ('code', object),
+    ('code_system', object),
+    ('value', float),
+    ('unit', object),
+    ('reference_range_low', float),
+    ('reference_range_high', float),
+]
+
+
+def results(data):
+    """
+    Returns the tests of every panel in `data.results`
+    """
+    rows = []
+    for panel in data.results:
+        for test in panel.tests:
+            reference_range = test.reference_range
+            rows.append((test.date, test.code, test.code_system, test.value,
+                         test.unit, reference_range.low_value,
+                         reference_range.high_value))
+    return _to_array(rows)
+
+
+def vitals(data):
+    """
+    Returns the results of every entry in `data.vitals`, each with the date
+    of its entry
+    """
+    rows = []
+    for entry in data.vitals:
+        for result in entry.results:
+            rows.append((entry.date, result.code, result.code_system,
+                         result.value, result.unit, None, None))
+    return _to_array(rows)
+
+
+# Section => function making its array
+SECTIONS = {
+    'results': results,
+    'vitals': vitals,
+}
+
+
+def dtype():
+    if numpy is None:
+        raise ImportError('columnar views require numpy to be installed')
+    return numpy.dtype(FIELDS)
+
+
+def _to_array(rows):
+    array = numpy.empty(len(rows), dtype())
+    if not rows:
+        return array
+
+    dates, codes, code_systems, values, units, lows, highs = zip(*rows)
+    array['date'] = [_utc(date) for date in dates]
+    array['code'] = codes
+    array['code_system'] = code_systems
+    array['value'] = [_number(value) for value in values]
+    array['unit'] = units
+    array['reference_range_low'] = [_number(value) for value in lows]
+    array['reference_range_high'] = [_number(value) for value in highs]
+    return array
+
+
+def _utc(date):
+    if isinstance(date, datetime.datetime):
+        if date.tzinfo is not None:
+            date = (date - date.utcoffset()).replace(tzinfo=None)
+        return numpy.datetime64(date, 'us')
+    if isinstance(date, datetime.date):
+        return numpy.datetime64(date).astype('datetime64[us]')
+    return numpy.datetime64('NaT')
+
+
+def _number(value):
+    # as wrappers.parse_number() reads it, with NaN for what it can't
+    if isinstance(value, (int, long, float)) and not isinstance(value, bool):
+        return float(value)
+    try:
+        value = wrappers.parse_number(value)
+    except (TypeError, ValueError):
+        return numpy.nan
+    return numpy.nan if value is None else float(value)
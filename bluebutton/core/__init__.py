@@ -19,12 +19,12 @@ def json():
     raise NotImplementedError()
 
 
-def parse_data(source):
+def parse_data(source, backend=None):
     source_stripped = strip_whitespace(source)
 
     if source_stripped.startswith('<?xml') or \
             source_stripped.startswith("<ClinicalDocument"): # <?xml decl is not compulsory
-        return xml.parse(source)
+        return xml.parse(source, backend)
 
     try:
         return std_json.loads(source)
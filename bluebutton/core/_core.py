@@ -4,8 +4,81 @@
 # Use of this source code is governed by the license found in the LICENSE file.
 ###############################################################################
 
+import threading
+
+
 def strip_whitespace(text):
     """ Remove leading and trailing whitespace from a string """
     if not isinstance(text, basestring):
         return text
     return text.strip()
+
+
+def lru_cache(maxsize):
+    """
+    Decorator memoizing a function of one hashable argument, keeping the
+    results of the `maxsize` most recently used arguments (a cut-down
+    functools.lru_cache, which Python 2 lacks). Exceptions aren't cached.
+
+    The wrapper has cache_info(), returning (hits, misses, maxsize, size), and
+    cache_clear().
+    """
+    def decorating_function(function):
+        cache = {}
+        # circular doubly linked list of [prev, next, key, result], oldest
+        # first after the root
+        root = []
+        root[:] = [root, root, None, None]
+        stats = [0, 0]  # hits, misses
+        lock = threading.Lock()
+
+        def wrapper(key):
+            with lock:
+                link = cache.get(key)
+                if link is not None:
+                    # move to the most recently used end
+                    link_prev, link_next, _, result = link
+                    link_prev[1] = link_next
+                    link_next[0] = link_prev
+                    last = root[0]
+                    last[1] = root[0] = link
+                    link[0] = last
+                    link[1] = root
+                    stats[0] += 1
+                    return result
+
+            result = function(key)
+
+            with lock:
+                stats[1] += 1
+                if key in cache:
+                    # added by another thread meanwhile
+                    return result
+                if len(cache) >= maxsize:
+                    oldest = root[1]
+                    root[1] = oldest[1]
+                    oldest[1][0] = root
+                    del cache[oldest[2]]
+                last = root[0]
+                link = [last, root, key, result]
+                last[1] = root[0] = cache[key] = link
+            return result
+
+        def cache_info():
+            with lock:
+                return stats[0], stats[1], maxsize, len(cache)
+
+        def cache_clear():
+            with lock:
+                cache.clear()
+                root[:] = [root, root, None, None]
+                stats[:] = [0, 0]
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        wrapper.__wrapped__ = function
+        return wrapper
+
+    return decorating_function
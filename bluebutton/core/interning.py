@@ -0,0 +1,117 @@
+###############################################################################
+# Copyright 2015 University of Florida. All rights reserved.
+# This file is part of the BlueButton.py project.
+# Use of this source code is governed by the license found in the LICENSE file.
+###############################################################################
+
+"""
+An optional, process-wide pool of the coded attribute values that parsed
+documents repeat over and over (LOINC, SNOMED and RxNorm codes, code system
+OIDs and names, display names and units).
+
+It is off by default. Once enable() has been called, every value of the
+ATTRIBUTES read by the parsers is looked up in the pool, so that all the
+entries of all the documents parsed by the process share one string per
+distinct value instead of each holding its own copy:
+
+    from bluebutton.core import interning
+    interning.enable()
+    ...  # parse documents
+    print interning.get_pool().stats()
+"""
+
+import sys
+import threading
+
+
+# Attributes whose values are pooled
+ATTRIBUTES = frozenset(['code', 'codeSystem', 'codeSystemName', 'displayName',
+                        'unit'])
+
+
+class Pool(object):
+    """
+    Maps each value to the first equal string seen, keeping counts of how
+    often that saved a copy. Once it holds `max_size` values (if given), new
+    values are passed through rather than added. It can be shared by
+    threads.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._values = {}
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    def intern(self, value):
+        with self._lock:
+            shared = self._values.get(value)
+            if shared is None:
+                self.misses += 1
+                if self.max_size is None or \
+                        len(self._values) < self.max_size:
+                    self._values[value] = value
+                return value
+
+            self.hits += 1
+            if shared is not value:
+                self.bytes_saved += sys.getsizeof(value)
+            return shared
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def stats(self):
+        """
+        Returns the pool's size and counters:
+            values      - distinct values held
+            bytes       - memory taken by the held values
+            hits        - lookups answered with a pooled value
+            misses      - lookups of values that weren't pooled yet
+            bytes_saved - memory taken by the copies that hits replaced
+        """
+        with self._lock:
+            return {
+                'values': len(self._values),
+                'bytes': sum(sys.getsizeof(value) for value in self._values),
+                'hits': self.hits,
+                'misses': self.misses,
+                'bytes_saved': self.bytes_saved,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def enable(max_size=None):
+    """
+    Starts pooling attribute values, if it hasn't been started yet, and
+    returns the pool
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = Pool(max_size)
+        return _pool
+
+
+def disable():
+    """
+    Stops pooling attribute values, and drops the pool
+    """
+    global _pool
+    _pool = None
+
+
+def get_pool():
+    """
+    Returns the pool, or None if pooling isn't enabled
+    """
+    return _pool
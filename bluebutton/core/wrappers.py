@@ -8,8 +8,10 @@
 Classes and functions that make ported code look more like original JavaScript
 """
 
+import collections
 import datetime
 import json
+import sys
 
 
 class FixedOffset(datetime.tzinfo):
@@ -21,7 +23,7 @@ class FixedOffset(datetime.tzinfo):
 
     @classmethod
     def UTC(cls):
-        return cls(0, 'UTC')
+        return _UTC
 
     @classmethod
     def from_string(cls, tz):
@@ -30,12 +32,25 @@ class FixedOffset(datetime.tzinfo):
         if not stripped or 'Z' == stripped:
             return cls.UTC()
 
+        # offsets are immutable, so one is shared by every date that has it
+        offset = _offsets.get(stripped)
+        if offset is not None:
+            return offset
+
         hour = int(stripped[1:3])
         minutes = hour*60 + int(stripped[3:5])
         if stripped[0] == '-':
             minutes *= -1
 
-        return cls(minutes, stripped)
+        offset = cls(minutes, stripped)
+        if len(_offsets) < _MAX_OFFSETS:
+            _offsets[stripped] = offset
+        return offset
+
+    def __getinitargs__(self):
+        # for pickling
+        return self.__offset.days * 24 * 60 + self.__offset.seconds // 60, \
+            self.__name
 
     def utcoffset(self, dt):
         return self.__offset
@@ -47,6 +62,13 @@ class FixedOffset(datetime.tzinfo):
         return datetime.timedelta(0)
 
 
+_UTC = FixedOffset(0, 'UTC')
+# FixedOffset.from_string()'s offsets by their string; there are only a few
+# dozen real ones, the limit guards against junk
+_offsets = {}
+_MAX_OFFSETS = 256
+
+
 class JSONEncoder(json.JSONEncoder):
     def default(self, o):
         if isinstance(o, datetime.datetime):
@@ -54,6 +76,10 @@ class JSONEncoder(json.JSONEncoder):
             return utc.isoformat().replace('+00:00', 'Z')
         elif isinstance(o, datetime.date):
             return o.strftime("%m/%d/%Y")
+        elif isinstance(o, Record):
+            return o._asdict()
+        elif isinstance(o, LazyObjectWrapper):
+            return o.evaluate().__dict__
         elif isinstance(o, ObjectWrapper):
             return o.__dict__
 
@@ -73,12 +99,543 @@ class ObjectWrapper(object):
         object.__setattr__(self, key, val)
 
     def json(self):
-        return json.dumps(self, cls=JSONEncoder)
+        return dumps(self)
+
+
+class LazyObjectWrapper(ObjectWrapper):
+    """
+    An ObjectWrapper whose attributes are computed by the functions in
+    `loaders` (an ordered mapping of name => function) the first time they
+    are accessed, and kept from then on. Each function is dropped once it
+    has run, and `loaders` once they all have, so that nothing they hold on
+    to (such as the document they parse) outlives its use.
+    """
+    __slots__ = ('_loaders', '_evaluated', '_pending')
+
+    def __init__(self, loaders):
+        self._loaders = loaders
+        self._evaluated = False
+        # loaders that haven't run yet
+        self._pending = len(loaders)
+
+    def __getattr__(self, name):
+        # only called for attributes that haven't been set yet
+        loaders = self._loaders
+        if name.startswith('_') or loaders is None or \
+                loaders.get(name) is None:
+            raise AttributeError(name)
+        value = loaders[name]()
+        setattr(self, name, value)
+        loaders[name] = None
+        self._pending -= 1
+        if not self._pending:
+            self._finish()
+        return value
+
+    def evaluate(self):
+        """
+        Computes every attribute that hasn't been accessed yet, leaving them
+        in the same order as an eagerly built ObjectWrapper would have them.
+        """
+        if not self._evaluated:
+            for name in list(self._loaders):
+                getattr(self, name)
+            if not self._evaluated:
+                # some were set rather than loaded
+                self._finish()
+        return self
+
+    def _finish(self):
+        values = [(name, self.__dict__[name]) for name in self._loaders]
+        self.__dict__.clear()
+        for name, value in values:
+            setattr(self, name, value)
+        self._loaders = None
+        self._evaluated = True
+
+
+class Record(object):
+    """
+    Base class of the fixed-field objects that parsers return, which use
+    __slots__ rather than a per-instance __dict__. Subclasses are made with
+    record().
+    """
+    __slots__ = ()
+    _fields = ()
+    _order = ()
+    # the class made by record(), and its subclass that the empty instance
+    # and freeze()'s copies are instances of
+    _record = None
+    _frozen = None
+    _empty = None
+
+    def __init__(self, **kwargs):
+        for field in self._fields:
+            setattr(self, field, kwargs.pop(field, None))
+        if kwargs:
+            raise TypeError('%s has no field(s) %s'
+                            % (type(self).__name__, ', '.join(sorted(kwargs))))
+
+    @classmethod
+    def of(cls, **kwargs):
+        """
+        Like cls(**kwargs), but returns the shared empty instance (see
+        empty()) when every field is None
+        """
+        for field, value in kwargs.iteritems():
+            if value is not None or field not in cls._fields:
+                return cls(**kwargs)
+        return cls._empty
+
+    @classmethod
+    def empty(cls):
+        """
+        Returns the instance of this record with every field None that is
+        shared by all of its users, and so can't be changed
+        """
+        return cls._empty
+
+    def _asdict(self):
+        d = {}
+        for field in self._order:
+            d[field] = getattr(self, field)
+        return d
+
+    def __getstate__(self):
+        return tuple(getattr(self, field) for field in self._fields)
+
+    def __setstate__(self, state):
+        for field, value in zip(self._fields, state):
+            setattr(self, field, value)
+
+    def __eq__(self, other):
+        return isinstance(other, Record) and \
+            self._record is other._record and \
+            self.__getstate__() == other.__getstate__()
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, ', '.join(
+            '%s=%r' % (field, getattr(self, field)) for field in self._fields))
+
+    def json(self):
+        return dumps(self)
+
+
+def record(name, fields):
+    """
+    Makes a Record subclass called `name` with the given fields (in the
+    order they should be serialized), e.g.:
+        Quantity = record('Quantity', ['value', 'unit'])
+        dose = Quantity(value='1', unit='mg')
+    Fields that aren't passed to the constructor are None.
+    """
+    fields = tuple(fields)
+    # _asdict() fills its dict in the order ObjectWrapper(**kwargs) would
+    # have set these fields' attributes, so that both serialize the same: the
+    # call's keywords are collected (last first) into one dict, then copied
+    # into the **kwargs one that ObjectWrapper.__init__ iterates over
+    call = {}
+    for field in reversed(fields):
+        call[field] = None
+    kwargs = {}
+    for field in call:
+        kwargs[field] = None
+    order = tuple(kwargs)
+    to_dict, dumps = _record_functions(order)
+    cls = type(name, (Record,), {
+        '__slots__': fields, '_fields': fields, '_order': order,
+        '_to_dict': staticmethod(to_dict), '_dumps': staticmethod(dumps),
+    })
+    # like namedtuple, so that instances can be pickled
+    cls.__module__ = sys._getframe(1).f_globals.get('__name__', '__main__')
+    cls._record = cls
+
+    # instances that can't be changed: the empty one, and freeze()'s
+    frozen = type(name, (cls,), {'__slots__': (),
+                                 '__setattr__': _refuse_change,
+                                 '__delattr__': _refuse_change,
+                                 '__setstate__': _refuse_change,
+                                 '__reduce__': _reduce_frozen})
+    frozen.__module__ = cls.__module__
+    cls._frozen = frozen
+    cls._empty = _frozen_record(cls, (None,) * len(fields))
+
+    return cls
+
+
+def _record_functions(order):
+    # to_dict() and dumps() for a record with these fields, written out field
+    # by field (as namedtuple does its methods) since that's much faster than
+    # looping over them
+    to_dict = ['def _to_dict(o):', '    d = {}']
+    for field in order:
+        to_dict.append('    d[%r] = to_dict(o.%s)' % (field, field))
+    to_dict.append('    return d')
+
+    # the order that the dict _asdict() fills in `order` iterates in
+    asdict = {}
+    for field in order:
+        asdict[field] = None
+    template = '{' + ', '.join(
+        '%s: %%s' % json.encoder.encode_basestring_ascii(field)
+        for field in asdict) + '}'
+    # with the commonest values, None and strings, written out inline
+    dumps = ['def _dumps(o):']
+    for i, field in enumerate(asdict):
+        dumps.append('    v = o.%s' % field)
+        dumps.append("    v%d = 'null' if v is None else _json_string(v) "
+                     "if type(v) is str else _json(v)" % i)
+    dumps.append('    return %r %% (%s,)' % (template, ', '.join(
+        'v%d' % i for i in range(len(asdict)))))
+
+    namespace = {}
+    exec '\n'.join(to_dict + dumps) in globals(), namespace
+    return namespace['_to_dict'], namespace['_dumps']
+
+
+def _refuse_change(self, *args):
+    raise AttributeError("this %s is shared and can't be changed"
+                         % type(self).__name__)
+
+
+def _reduce_frozen(self):
+    if self is self._empty:
+        # unpickles (and copies) as the shared instance
+        return getattr, (self._record, '_empty')
+    return _frozen_record, (self._record, self.__getstate__())
+
+
+def _frozen_record(cls, state):
+    o = Record.__new__(cls._frozen)
+    for field, value in zip(cls._fields, state):
+        object.__setattr__(o, field, value)
+    return o
 
 
 class ListWrapper(list):
     def json(self):
-        return json.dumps(self, cls=JSONEncoder)
+        return dumps(self)
+
+
+class FrozenListWrapper(ListWrapper):
+    """
+    A ListWrapper that can't be changed (see freeze())
+    """
+    def _refuse_change(self, *args, **kwargs):
+        raise TypeError("this list is shared and can't be changed")
+
+    __setitem__ = __delitem__ = __setslice__ = __delslice__ = \
+        __iadd__ = __imul__ = append = extend = insert = pop = remove = \
+        reverse = sort = _refuse_change
+
+    def __reduce__(self):
+        return FrozenListWrapper, (list(self),)
+
+
+def freeze(o):
+    """
+    Returns a copy of parsed output that can't be changed, so that it can be
+    shared (between threads, say) without one user's changes showing up for
+    the others: records become frozen instances of their class, ListWrappers
+    FrozenListWrappers and other lists tuples. Strings, numbers and dates are
+    returned as they are; wrappers and dicts raise TypeError.
+    """
+    if isinstance(o, Record):
+        if isinstance(o, o._frozen):
+            return o
+        state = tuple(freeze(getattr(o, field)) for field in o._fields)
+        if all(value is None for value in state):
+            return o._empty
+        return _frozen_record(o._record, state)
+    if isinstance(o, FrozenListWrapper):
+        return o
+    if isinstance(o, ListWrapper):
+        return FrozenListWrapper(freeze(item) for item in o)
+    if isinstance(o, (list, tuple)):
+        return tuple(freeze(item) for item in o)
+    if isinstance(o, (dict, ObjectWrapper)):
+        raise TypeError("Can't freeze %s" % type(o).__name__)
+    return o
+
+
+def dumps(o):
+    """
+    Returns parsed output (wrappers, records and lists of them, dates and
+    plain values) as JSON, exactly as json.dumps(o, cls=JSONEncoder) would.
+
+    Rather than building a dict for every object for the encoder to walk,
+    it writes the JSON in a single pass, looking up how to write each
+    object by its type, with record classes' JSON templates made up front
+    (see record()).
+    """
+    return _json(o)
+
+
+def dump(o, fp):
+    """
+    Writes parsed output to the file-like object `fp` as the same JSON that
+    dumps() returns, a section and an entry at a time rather than as one
+    string. Sections of a lazily parsed document are parsed as they're
+    written.
+    """
+    fields = _fields(o)
+    if fields is None:
+        if isinstance(o, (list, tuple)):
+            _dump_list(o, fp)
+        else:
+            fp.write(dumps(o))
+        return
+
+    fp.write('{')
+    for i, (key, value) in enumerate(fields):
+        fp.write((', ' if i else '') + _json_string(key) + ': ')
+        if isinstance(value, (list, tuple)):
+            _dump_list(value, fp)
+        else:
+            fp.write(_json(value))
+    fp.write('}')
+
+
+def dump_ndjson(o, fp, document_id=None):
+    """
+    Writes parsed output to the file-like object `fp` as newline-delimited
+    JSON: a line per entry of each section (a section that isn't a list is a
+    single entry), like:
+        {"document": <document_id>, "section": "allergies", "entry": {...}}
+    """
+    fields = _fields(o)
+    if fields is None:
+        raise TypeError('Expected an object of sections, not %s'
+                        % type(o).__name__)
+
+    prefix = '{"document": %s, "section": ' % _json(document_id)
+    for key, value in fields:
+        line = prefix + _json_string(key) + ', "entry": %s}\n'
+        if isinstance(value, (list, tuple)):
+            for entry in value:
+                fp.write(line % _json(entry))
+        else:
+            fp.write(line % _json(value))
+
+
+def _fields(o):
+    """
+    Returns an iterator over the (key, value) pairs that `o` is written as,
+    in order, or None if it isn't written as a JSON object
+    """
+    if isinstance(o, LazyObjectWrapper):
+        # the order evaluate() would leave them in, getting each (and so
+        # parsing its section) only as it's reached
+        if o._evaluated:
+            keys = list(o.__dict__)
+        else:
+            keys = {}
+            for key in o._loaders:
+                keys[key] = None
+        return ((key, getattr(o, key)) for key in keys)
+    if isinstance(o, ObjectWrapper):
+        return o.__dict__.iteritems()
+    if isinstance(o, Record):
+        return iter(o._asdict().items())
+    if isinstance(o, dict) and all(isinstance(key, basestring) for key in o):
+        return o.iteritems()
+    return None
+
+
+def _dump_list(o, fp):
+    fp.write('[')
+    for i, value in enumerate(o):
+        fp.write((', ' if i else '') + _json(value))
+    fp.write(']')
+
+
+def to_dict(o):
+    """
+    Returns parsed output as the plain dicts, lists and strings that
+    JSONEncoder would turn it into (dicts keep their keys' order, so the
+    standard encoder makes the same JSON from both)
+    """
+    convert = _plain_converters.get(type(o))
+    if convert is None:
+        convert = _converter(_plain_converters, type(o))
+    return convert(o)
+
+
+def _json(o):
+    write = _json_converters.get(type(o))
+    if write is None:
+        write = _converter(_json_converters, type(o))
+    return write(o)
+
+
+def _same(o):
+    return o
+
+
+def _plain_list(o):
+    return [to_dict(value) for value in o]
+
+
+def _plain_dict(o):
+    return collections.OrderedDict(
+        (key, to_dict(value)) for key, value in o.iteritems())
+
+
+def _datetime(o):
+    if o.tzinfo is None or o.microsecond:
+        return _ENCODER.default(o)
+    utc = o - o.utcoffset()
+    return '%04d-%02d-%02dT%02d:%02d:%02dZ' % (
+        utc.year, utc.month, utc.day, utc.hour, utc.minute, utc.second)
+
+
+def _date(o):
+    if o.year < 1900:
+        # where strftime() gives up
+        return _ENCODER.default(o)
+    return '%02d/%02d/%04d' % (o.month, o.day, o.year)
+
+
+def _plain_unknown(o):
+    return to_dict(_ENCODER.default(o))
+
+
+_json_string = json.encoder.encode_basestring_ascii
+
+
+def _json_none(o):
+    return 'null'
+
+
+def _json_bool(o):
+    return 'true' if o else 'false'
+
+
+def _json_float(o):
+    if o != o:
+        return 'NaN'
+    if o == _INFINITY:
+        return 'Infinity'
+    if o == -_INFINITY:
+        return '-Infinity'
+    return repr(o)
+
+
+def _json_list(o):
+    if not o:
+        return '[]'
+    return '[' + ', '.join([_json_string(value) if type(value) is str
+                            else _json(value) for value in o]) + ']'
+
+
+def _json_dict(o):
+    if not o:
+        return '{}'
+    for key in o:
+        if not isinstance(key, basestring):
+            # leave the encoder's rules for other keys to the encoder
+            return json.dumps(to_dict(o))
+    return '{' + ', '.join([_json_string(key) + ': ' + _json(value)
+                            for key, value in o.iteritems()]) + '}'
+
+
+def _converter(converters, cls):
+    # for a subclass of one of the types in the table, or a Record
+    if converters is _plain_converters:
+        bases, default = _PLAIN_BASE_CONVERTERS, _plain_unknown
+    else:
+        bases, default = _JSON_BASE_CONVERTERS, _json_unknown
+
+    for base, convert in bases:
+        if issubclass(cls, base):
+            break
+    else:
+        convert = default
+
+    if convert is _RECORD:
+        convert = cls._to_dict if converters is _plain_converters \
+            else cls._dumps
+    converters[cls] = convert
+    return convert
+
+
+def _json_unknown(o):
+    return _json(_ENCODER.default(o))
+
+
+_ENCODER = JSONEncoder()
+_INFINITY = float('inf')
+# stands for a record class's own function in the tables below
+_RECORD = object()
+
+# type => function returning its objects as to_dict() does; subclasses are
+# looked up in _PLAIN_BASE_CONVERTERS (most specific first) and added
+_plain_converters = {
+    type(None): _same,
+    bool: _same,
+    int: _same,
+    long: _same,
+    float: _same,
+    str: _same,
+    unicode: _same,
+    list: _plain_list,
+    tuple: _plain_list,
+    ListWrapper: _plain_list,
+    dict: _plain_dict,
+    ObjectWrapper: lambda o: _plain_dict(o.__dict__),
+    LazyObjectWrapper: lambda o: _plain_dict(o.evaluate().__dict__),
+    datetime.datetime: _datetime,
+    datetime.date: _date,
+}
+
+_PLAIN_BASE_CONVERTERS = [
+    (Record, _RECORD),
+    (LazyObjectWrapper, _plain_converters[LazyObjectWrapper]),
+    (ObjectWrapper, _plain_converters[ObjectWrapper]),
+    (datetime.datetime, _datetime),
+    (datetime.date, _date),
+    ((basestring, int, long, float), _same),
+    ((list, tuple), _plain_list),
+    (dict, _plain_dict),
+]
+
+# type => function returning its objects as JSON, likewise
+_json_converters = {
+    type(None): _json_none,
+    bool: _json_bool,
+    int: str,
+    long: str,
+    float: _json_float,
+    str: _json_string,
+    unicode: _json_string,
+    list: _json_list,
+    tuple: _json_list,
+    ListWrapper: _json_list,
+    dict: _json_dict,
+    ObjectWrapper: lambda o: _json_dict(o.__dict__),
+    LazyObjectWrapper: lambda o: _json_dict(o.evaluate().__dict__),
+    datetime.datetime: lambda o: _json_string(_datetime(o)),
+    datetime.date: lambda o: _json_string(_date(o)),
+}
+
+_JSON_BASE_CONVERTERS = [
+    (Record, _RECORD),
+    (LazyObjectWrapper, _json_converters[LazyObjectWrapper]),
+    (ObjectWrapper, _json_converters[ObjectWrapper]),
+    (datetime.datetime, _json_converters[datetime.datetime]),
+    (datetime.date, _json_converters[datetime.date]),
+    (bool, _json_bool),
+    (basestring, _json_string),
+    ((int, long), lambda o: str(o)),
+    (float, _json_float),
+    ((list, tuple), _json_list),
+    (dict, _json_dict),
+]
 
 
 def parse_number(s):
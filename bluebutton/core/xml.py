@@ -5,34 +5,406 @@
 ###############################################################################
 
 from __future__ import absolute_import
+import bisect
+import hashlib
 import logging
 from xml.etree import ElementTree as etree
 
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+from . import interning
 from . import wrappers
 from . import _core as core
 
 
 logging.getLogger(__name__).addHandler(logging.NullHandler())
 
+NAMESPACE = '{urn:hl7-org:v3}'
+
+# Tags that narrative <reference value="#ID"/> links are resolved against, in
+# order of preference when the same ID is used more than once
+_CONTENT_TAG_PRIORITY = ('content', 'td', 'caption', 'paragraph', 'tr', 'item')
+_CONTENT_TAGS = dict((NAMESPACE + tag, tag) for tag in _CONTENT_TAG_PRIORITY)
+
 
-def parse(data):
+def parse(data, backend=None):
+    """
+    Parse an XML string into an _Element with the added querying methods.
+
+    `backend` is the name of one of the BACKENDS (or a backend instance); by
+    default ElementTree is used.
+    """
     if not data or not isinstance(data, basestring):
         logging.info('BB Error: XML data is not a string')
         return None
 
+    backend = get_backend(backend)
+
     try:
-        root = etree.fromstring(data)
+        root = backend.fromstring(data)
     except:
         logging.info('BB Error: Could not parse XML')
         return None
 
-    return _Element.wrap_root(root)
+    return _Element.wrap_root(root, backend)
+
+
+def parse_header(source, backend=None):
+    """
+    Reads `source` (an XML string or a file-like object) only up to the
+    first <component> child of its root, which in a CDA document is the
+    start of the body, and returns the root holding what came before it,
+    wrapped as an _Element. Raises SyntaxError if the XML read is malformed.
+    """
+    backend = get_backend(backend)
+    component_tag = NAMESPACE + 'component'
+    # small reads, so that little is parsed past the header
+    source, encoding = _byte_stream(source, 1024)
+
+    depth = 0
+    root = None
+    for event, el in backend.iterparse(source, ('start', 'end'), encoding):
+        if 'end' == event:
+            depth -= 1
+            continue
+
+        if root is None:
+            root = el
+        elif 1 == depth and el.tag == component_tag:
+            # the parser may have built some of what follows already
+            del root[list(root).index(el):]
+            break
+        depth += 1
+
+    return _Element.wrap_root(root, backend)
+
+
+def iterparse(source, backend=None, tags=None):
+    """
+    Returns an iterator over `('start', element)` and `('end', element)` for
+    each element of `source` (an XML string or a file-like object), read as
+    a stream, or only for those with the (namespaced) `tags` if given. The
+    tree is still built as it's read, so consumers clear (and detach) the
+    elements they're done with to keep memory use bounded.
+    """
+    backend = get_backend(backend)
+    source, encoding = _byte_stream(source)
+    return backend.iterparse(source, ('start', 'end'), encoding, tags)
+
+
+def iter_sections(source, backend=None):
+    """
+    Stream `source` (an XML string or a file-like object), yielding
+    `(root, section)` for each outermost <section> element once it has been
+    read in full, then `(root, None)` at the end of the document. `root` is
+    the document's root element, which holds everything read so far apart
+    from earlier sections.
+
+    Each section is cleared and detached from the tree when the consumer
+    asks for the next one, so memory use is bounded by the largest section
+    rather than by the whole document.
+    """
+    section_tag = NAMESPACE + 'section'
+
+    open_sections = 0
+    stack = []
+    root = None
+    for event, el in iterparse(source, backend):
+        if 'start' == event:
+            if root is None:
+                root = el
+            stack.append(el)
+            if el.tag == section_tag:
+                open_sections += 1
+            continue
+
+        stack.pop()
+        if el.tag != section_tag:
+            continue
+
+        open_sections -= 1
+        if open_sections:
+            continue
+
+        yield root, el
+
+        el.clear()
+        if stack:
+            stack[-1].remove(el)
+
+    yield root, None
+
+
+def _byte_stream(source, chunk_size=None):
+    # `source` as a file-like object for iterparse(), and the encoding to
+    # read it with if it has to be given
+    encoding = None
+    if isinstance(source, unicode):
+        source = source.encode('utf-8')
+        encoding = 'utf-8'
+    if isinstance(source, str):
+        source = _StringReader(source, chunk_size)
+    return source, encoding
+
+
+class _StringReader(object):
+    """
+    A file-like view of a string, which unlike io.BytesIO doesn't copy it
+    up front: a parser that stops early only pays for what it read. Reads
+    return at most `chunk_size` bytes, if given, since parsers build (and
+    report events for) all of each chunk they're handed.
+    """
+
+    def __init__(self, string, chunk_size=None):
+        self._string = string
+        self._position = 0
+        self._chunk_size = chunk_size
+
+    def read(self, size=-1):
+        if self._chunk_size is not None and \
+                (size < 0 or size > self._chunk_size):
+            size = self._chunk_size
+        start = self._position
+        end = len(self._string) if size < 0 else start + size
+        self._position = min(end, len(self._string))
+        return self._string[start:end]
+
+
+class EtreeBackend(object):
+    """
+    The standard library's xml.etree.ElementTree. Elements don't know their
+    parents, so the document index keeps a map of them.
+    """
+    name = 'etree'
+    has_parents = False
+
+    def fromstring(self, data):
+        return etree.fromstring(data)
+
+    def iterparse(self, source, events, encoding=None, tags=None):
+        events = etree.iterparse(source, events,
+                                 etree.XMLParser(encoding=encoding))
+        if tags is None:
+            return events
+        tags = frozenset(tags)
+        return ((event, el) for event, el in events if el.tag in tags)
+
+    def tostring(self, element):
+        return etree.tostring(element)
+
+
+class LxmlBackend(object):
+    """
+    lxml.etree, which builds the tree in C and has parent pointers.
+    Comments and processing instructions are dropped so that the tree has the
+    same shape as ElementTree's.
+
+    libxml2's limits on the depth of the tree and the size of text nodes
+    stay on unless `huge_tree` is passed, for documents from trusted
+    sources that exceed them:
+        BlueButton(source, {'backend': LxmlBackend(huge_tree=True)})
+    """
+    name = 'lxml'
+    has_parents = True
+
+    def __init__(self, huge_tree=False):
+        if lxml_etree is None:
+            raise ImportError('the lxml backend requires lxml to be installed')
+        self.huge_tree = huge_tree
+
+    def fromstring(self, data):
+        # lxml won't take unicode strings that have an encoding declaration
+        encoding = None
+        if isinstance(data, unicode):
+            data = data.encode('utf-8')
+            encoding = 'utf-8'
+
+        # parsers can't be shared between threads, so one is made per document
+        parser = lxml_etree.XMLParser(encoding=encoding,
+                                      remove_comments=True,
+                                      remove_pis=True,
+                                      resolve_entities=False,
+                                      huge_tree=self.huge_tree)
+        return lxml_etree.fromstring(data, parser)
+
+    def iterparse(self, source, events, encoding=None, tags=None):
+        # lxml filters by tag in C, so the other elements cost no events
+        return lxml_etree.iterparse(source, events,
+                                    tag=tags,
+                                    encoding=encoding,
+                                    remove_comments=True,
+                                    remove_pis=True,
+                                    resolve_entities=False,
+                                    huge_tree=self.huge_tree)
+
+    def tostring(self, element):
+        return lxml_etree.tostring(element, with_tail=False)
+
+    def parent(self, element):
+        return element.getparent()
+
+
+BACKENDS = {
+    EtreeBackend.name: EtreeBackend,
+    LxmlBackend.name: LxmlBackend,
+}
+
+
+def get_backend(backend=None):
+    """
+    Return a backend instance from a name in BACKENDS, an instance, or None
+    for the default (etree; lxml is faster, but has to be asked for).
+    """
+    if backend is None:
+        backend = EtreeBackend.name
+
+    if isinstance(backend, basestring):
+        if backend not in BACKENDS:
+            raise ValueError('Unknown XML backend %r, expected one of %s'
+                             % (backend, ', '.join(sorted(BACKENDS))))
+        return BACKENDS[backend]()
+
+    return backend
+
+
+class _DocumentIndex(object):
+    """
+    Lookup tables for a parsed document, built in a single pass over the tree
+    when the root is wrapped and shared by every _Element of that document.
+
+    Every element is numbered in document order and remembers the range of
+    numbers its subtree spans, so a lookup scoped to an element is a bisect
+    into the ordered list of candidates.
+    """
+
+    def __init__(self, root, backend=None):
+        self.root = root
+        self.backend = backend or EtreeBackend()
+        self.parents = {}
+        self.spans = {root: (0, 0)}
+        # templateId @root (or (@root, @extension)) => ordered positions and
+        # the matching templateId elements
+        self.templates = {}
+        # (tag, @ID) => ordered positions and the matching narrative elements
+        self.ids = {}
+        # tag => ordered positions and elements, built on the first query
+        self.tags = None
+
+        template_tag = NAMESPACE + 'templateId'
+        position = 0
+        stack = [(root, iter(root))]
+        while stack:
+            parent, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                self.spans[parent] = (self.spans[parent][0], position)
+                continue
+
+            position += 1
+            if not self.backend.has_parents:
+                self.parents[child] = parent
+            self.spans[child] = (position, position)
+            if child.tag == template_tag:
+                _add(self.templates, child.get('root'), position, child)
+                if child.get('extension') is not None:
+                    _add(self.templates,
+                         (child.get('root'), child.get('extension')),
+                         position, child)
+            elif child.get('ID') is not None and child.tag in _CONTENT_TAGS:
+                _add(self.ids, (_CONTENT_TAGS[child.tag], child.get('ID')),
+                     position, child)
+            stack.append((child, iter(child)))
+
+    def parent(self, element):
+        if self.backend.has_parents:
+            return self.backend.parent(element)
+        return self.parents.get(element)
+
+    def template(self, element, template_id, extension=None):
+        """
+        Return the first templateId element with `template_id` (and
+        `extension`, if given) at or below `element`, in document order.
+        """
+        if element not in self.spans:
+            # not part of the indexed tree, fall back to scanning it
+            for el in element.iter(NAMESPACE + 'templateId'):
+                if el.get('root') == template_id and \
+                        extension in (None, el.get('extension')):
+                    return el
+            return None
+
+        key = template_id if extension is None else (template_id, extension)
+        return self._first_within(self.templates, key, element)
+
+    def content(self, element, tag, content_id):
+        """
+        Return the first `tag` element with an ID of `content_id` at or below
+        `element`, in document order.
+        """
+        if element not in self.spans:
+            return _tag_attr_val(element, tag, 'ID', content_id)
+        return self._first_within(self.ids, (tag, content_id), element)
+
+    def descendants(self, element, tag):
+        """
+        Return every `tag` element below `element`, in document order.
+        """
+        if element not in self.spans:
+            return element.findall('.//' + tag)
+
+        i, j = self._range(self._tags(), tag, element, include_self=False)
+        return self.tags[tag][1][i:j] if i < j else []
+
+    def first_descendant(self, element, tag):
+        """
+        Return the first `tag` element below `element`, in document order.
+        """
+        if element not in self.spans:
+            return element.find('.//' + tag)
+
+        i, j = self._range(self._tags(), tag, element, include_self=False)
+        return self.tags[tag][1][i] if i < j else None
+
+    def _tags(self):
+        if self.tags is None:
+            self.tags = {}
+            for position, el in enumerate(self.root.iter()):
+                _add(self.tags, el.tag, position, el)
+        return self.tags
+
+    def _first_within(self, table, key, element):
+        i, j = self._range(table, key, element)
+        return table[key][1][i] if i < j else None
+
+    def _range(self, table, key, element, include_self=True):
+        # slice of table[key] that falls inside the subtree of `element`
+        if key not in table:
+            return 0, 0
+
+        positions = table[key][0]
+        start, end = self.spans[element]
+        if include_self:
+            i = bisect.bisect_left(positions, start)
+        else:
+            i = bisect.bisect_right(positions, start)
+        return i, bisect.bisect_right(positions, end, i)
+
+
+def _add(table, key, position, element):
+    positions, elements = table.setdefault(key, ([], []))
+    positions.append(position)
+    elements.append(element)
 
 
 class _Element(object):
-    def __init__(self, element, root):
+    def __init__(self, element, root, index=None):
         self._element = element
         self._root = root
+        self._index = index
 
     def __setattr__(self, key, value):
         val = value.__get__(self, self.__class__) if callable(value) else value
@@ -47,7 +419,12 @@ class _Element(object):
 
         attr_val = self._element.get(name)
         if attr_val:
-            return _unescape_special_chars(attr_val)
+            attr_val = _unescape_special_chars(attr_val)
+            if attribute_name in interning.ATTRIBUTES:
+                pool = interning.get_pool()
+                if pool is not None:
+                    return pool.intern(attr_val)
+            return attr_val
         return None
 
     def bool_attr(self, attribute_name):
@@ -68,22 +445,15 @@ class _Element(object):
         in this context) is not the same attribute as `id` in XML, so there are
         no matches
         """
-        el = _tag_attr_val(self._element, 'content', 'ID', content_id)
-        if el is None:
-            # check the <td> tag too, which isn't really correct but
-            # will inevitably be used sometimes because it looks like very
-            # normal HTML to put the data directly in a <td>
-            el = _tag_attr_val(self._element, 'td', 'ID', content_id)
-
-        if el is None:
-            # Ugh, Epic uses really non-standard locations.
-            el = _tag_attr_val(self._element, 'caption', 'ID', content_id)
-            if el is None:
-                el = _tag_attr_val(self._element, 'paragraph', 'ID', content_id)
-            if el is None:
-                el = _tag_attr_val(self._element, 'tr', 'ID', content_id)
-            if el is None:
-                el = _tag_attr_val(self._element, 'item', 'ID', content_id)
+        index = self._get_index()
+        el = None
+        # <content> is the correct place for these, but <td> looks like very
+        # normal HTML to put the data in and Epic uses really non-standard
+        # locations, so those are checked too (in this order of preference)
+        for tag in _CONTENT_TAG_PRIORITY:
+            el = index.content(self._element, tag, content_id)
+            if el is not None:
+                break
 
         if el is None:
             return _Element.empty()
@@ -91,8 +461,9 @@ class _Element(object):
             return self._wrap_element(el)
 
     def els_by_tag(self, tag):
-        els = self._element.findall(
-            ".//{ns}{name}".format(name=tag, ns='{urn:hl7-org:v3}'))
+        if not len(self._element):
+            return wrappers.ListWrapper()
+        els = self._get_index().descendants(self._element, NAMESPACE + tag)
         return self._wrap_element(els)
 
     @classmethod
@@ -102,15 +473,38 @@ class _Element(object):
     def is_empty(self):
         return self._element.tag.lower() == 'empty'
 
+    def digest(self, exclude=()):
+        """
+        Returns a hash of the element's XML, leaving out its children with
+        the tags in `exclude`, or None if the element is empty
+        """
+        if self.is_empty():
+            return None
+
+        backend = self._get_index().backend
+        digest = hashlib.sha1()
+        if not exclude:
+            digest.update(backend.tostring(self._element))
+        else:
+            exclude = set(NAMESPACE + tag for tag in exclude)
+            digest.update(repr((self._element.tag,
+                                sorted(self._element.attrib.items()))))
+            for child in self._element:
+                if child.tag not in exclude:
+                    digest.update(backend.tostring(child))
+        return digest.hexdigest()
+
     def tag(self, name):
-        el = self._element.find(".//{ns}{name}".format(name=name,
-                                                       ns='{urn:hl7-org:v3}'))
+        el = None
+        if len(self._element):
+            el = self._get_index().first_descendant(self._element,
+                                                    NAMESPACE + name)
         if el is None:
             return _Element.empty()
         else:
             return self._wrap_element(el)
 
-    def template(self, template_id):
+    def template(self, template_id, extension=None):
         """/*
             * Search for a template ID, and return its parent element.
             * Example:
@@ -118,18 +512,20 @@ class _Element(object):
             * Can be found using:
             *   el = dom.template('2.16.840.1.113883.10.20.22.2.17');
             */
+
+        Pass `extension` to only match templateIds that also carry that
+        extension attribute (e.g. the versioned C-CDA R2.1 templates).
         """
-        el = _tag_attr_val(self._element, 'templateId', 'root', template_id)
+        el = self._get_index().template(self._element, template_id, extension)
         # WARNING: DO NOT use "if not el:"
         # http://effbot.org/zone/element.htm#truth-testing
         if el is None:
             return _Element.empty()
-        else:
-            if not hasattr(el, 'parent'):
-                # TODO: replace with lxml .parent so we don't have to traverse a sub-tree *every* time we call this function
-                parent_map = {c: p for p in self._element.iter() for c in p}
-                el.parent = parent_map[el]
-            return self._wrap_element(el.parent)
+
+        parent = self._get_index().parent(el)
+        if parent is None:
+            return _Element.empty()
+        return self._wrap_element(parent)
 
     def val(self):
         """
@@ -179,23 +575,29 @@ class _Element(object):
         return _unescape_special_chars(text_context)
 
     @classmethod
-    def wrap_root(cls, root):
-        return cls(root, root)
+    def wrap_root(cls, root, backend=None):
+        return cls(root, root, _DocumentIndex(root, backend))
+
+    def _get_index(self):
+        if self._index is None:
+            # elements wrapped outside of wrap_root() index their own tree
+            self._index = _DocumentIndex(self._root if self._root is not None
+                                         else self._element)
+        return self._index
 
     def _get_root(self):
         return self._wrap_element(self._root)
 
     def _wrap_element(self, element):
         if issubclass(type(element), list):
-            return wrappers.ListWrapper([_Element(e, self._root)
+            return wrappers.ListWrapper([_Element(e, self._root, self._index)
                                          for e in element])
         else:
-            return _Element(element, self._root)
+            return _Element(element, self._root, self._index)
 
 
 def _tag_attr_val(element, tag, attribute, value):
-    namespace = '{urn:hl7-org:v3}'
-    for el in element.iter(namespace + tag):
+    for el in element.iter(NAMESPACE + tag):
         if el.get(attribute) == value:
             return el
 
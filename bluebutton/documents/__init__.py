@@ -7,7 +7,30 @@
 import datetime
 import re
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from ..core import _core as core
 from ..core import wrappers
+from ..core import xml
+
+
+# Shapes shared by the parsers' output
+Name = wrappers.record('Name', ['prefix', 'given', 'family'])
+Address = wrappers.record('Address',
+                          ['street', 'city', 'state', 'zip', 'country'])
+DateRange = wrappers.record('DateRange', ['start', 'end'])
+Quantity = wrappers.record('Quantity', ['value', 'unit'])
+# a coded concept, with and without the name of its code system
+Code = wrappers.record('Code', ['name', 'code', 'code_system'])
+Concept = wrappers.record('Concept', ['name', 'code', 'code_system',
+                                      'code_system_name'])
+Identifier = wrappers.record('Identifier', ['root', 'extension'])
+# what sniff() reads from a document's header
+Header = wrappers.record('Header', ['type', 'template_ids', 'effective_time',
+                                    'patient_ids'])
 
 
 def detect(data):
@@ -21,6 +44,45 @@ def detect(data):
         return 'ccda'
 
 
+def sniff(source, backend=None):
+    """
+    Returns the Header of a CDA document: its type as detect() tells it
+    ('ccda', 'c32' or None), the roots of its templateIds, its parsed
+    effectiveTime and its patients' ids (Identifiers). Only the header is
+    read, up to the first <component>, so this is far quicker than parsing
+    the document, and a file-like `source` is read no further.
+
+    Returns None if `source` isn't well-formed XML (as far as it was read).
+    """
+    try:
+        header = xml.parse_header(source, backend)
+    except SyntaxError:
+        return None
+
+    root = header._element
+    template_ids = []
+    effective_time = None
+    patient_ids = []
+    for child in root:
+        if child.tag == xml.NAMESPACE + 'templateId':
+            template_ids.append(child.get('root'))
+        elif child.tag == xml.NAMESPACE + 'effectiveTime':
+            effective_time = parse_date(child.get('value'))
+        elif child.tag == xml.NAMESPACE + 'recordTarget':
+            for el in child.iter(xml.NAMESPACE + 'patientRole'):
+                patient_ids.extend(
+                    Identifier(root=id.get('root'),
+                               extension=id.get('extension'))
+                    for id in el.findall(xml.NAMESPACE + 'id'))
+
+    return Header(
+        type=detect(header),
+        template_ids=template_ids,
+        effective_time=effective_time,
+        patient_ids=patient_ids,
+    )
+
+
 def entries(element):
     """
     Get entries within an element (with tag name 'entry'), adds an `each` method
@@ -46,7 +108,7 @@ def parse_address(address_element):
     zip = address_element.tag('postalCode').val()
     country = address_element.tag('country').val()
 
-    return wrappers.ObjectWrapper(
+    return Address.of(
         street=street,
         city=city,
         state=state,
@@ -76,6 +138,19 @@ def parse_date(string):
     if not isinstance(string, basestring):
         return None
 
+    return _parse_date_string(string)
+
+
+# owing to the vagueries of the different time formats we can get a range of
+# inputs. Solution: Regex!
+_TIME_RE = re.compile(
+    r'(\d{4})(\d{2})(\d{2})(\d{2})?(\d{2})?(\d{2})?(\.\d+)?([+-]\d{4}|Z)?')
+
+
+# dates are immutable, so each distinct string (the same few repeat all over
+# a document) is parsed once
+@core.lru_cache(maxsize=4096)
+def _parse_date_string(string):
     if len(string) < 4:
         # not even a year
         return None
@@ -95,13 +170,11 @@ def parse_date(string):
     # check for time info (the presence of at least hours and mins after the
     # date)
     if len(string) >= 12:
-        # owing to the vagueries of the different time formats we can get a range of inputs
-        # Solution: Regex!
-        time_re = re.compile(r'(\d{4})(\d{2})(\d{2})(\d{2})?(\d{2})?(\d{2})?(\.\d+)?([+-]\d{4}|Z)?')
-        if time_re.match(string):
+        match = _TIME_RE.match(string)
+        if match:
             # we capture microseconds, have seen in CCDA documents, but throw it away
             # we do need to capture the timezone, and the microseconds were throwing that off
-            _year, _month, _day, _hour, _mins, _secs, _msecs, _tz = time_re.match(string).groups()
+            _year, _month, _day, _hour, _mins, _secs, _msecs, _tz = match.groups()
             year = int(_year)
             month = int(_month)
             day = int(_day)
@@ -126,13 +199,154 @@ def parse_date(string):
     return datetime.date(year, month, day)
 
 
+# How much of a date parse_dates() found, from none at all (not a date, or a
+# date that parse_date() would reject) to the second
+PRECISION_NONE = 0
+PRECISION_YEAR = 1
+PRECISION_MONTH = 2
+PRECISION_DAY = 3
+PRECISION_MINUTE = 4
+PRECISION_SECOND = 5
+
+
+def parse_dates(strings):
+    """
+    Parses a sequence of HL7 dates all at once, without making a Python object
+    per date. Requires numpy.
+
+    Returns a pair of arrays as long as `strings`:
+        values    - datetime64[us], in UTC; dates without a time are at
+                    midnight UTC, and whatever parse_date() would return None
+                    for (or fail on) is NaT
+        precision - uint8, the PRECISION_* of each value
+
+    The usual forms ("YYYY", "YYYYMM", "YYYYMMDD" and "YYYYMMDDHHMM[SS]"
+    with optional fractional seconds and "[+|-]ZZzz" or "Z" offset) are
+    parsed with array operations; anything else is handed to parse_date().
+    """
+    if numpy is None:
+        raise ImportError('parse_dates requires numpy to be installed')
+
+    count = len(strings)
+    values = numpy.empty(count, 'datetime64[us]')
+    values[:] = numpy.datetime64('NaT')
+    precision = numpy.zeros(count, numpy.uint8)
+    if not count:
+        return values, precision
+
+    texts = [(s if isinstance(s, str) else s.encode('utf-8'))
+             if isinstance(s, basestring) else '' for s in strings]
+    packed = numpy.array(texts, dtype='S')
+    lengths = numpy.char.str_len(packed)
+    # one zero padded row of characters per string, wide enough to read the
+    # longest fixed-position field from
+    width = max(packed.itemsize, 20)
+    chars = numpy.zeros((count, width), numpy.uint8)
+    chars[:, :packed.itemsize] = packed.view(numpy.uint8).reshape(
+        count, packed.itemsize)
+    digits = (chars >= ord('0')) & (chars <= ord('9'))
+    numbers = chars.astype(numpy.int64) - ord('0')
+    rows = numpy.arange(count)
+
+    # the leading run of digits, which has the date and time
+    leading = numpy.where(digits.all(axis=1), width,
+                          numpy.argmin(digits, axis=1))
+
+    # the time zone, if any: a [+|-]ZZzz offset or Z at the very end
+    offset_at = numpy.maximum(lengths - 5, 0)
+    offset_sign = chars[rows, offset_at]
+    has_offset = (lengths - 5 >= leading) & \
+        ((offset_sign == ord('+')) | (offset_sign == ord('-')))
+    for i in range(1, 5):
+        has_offset &= digits[rows, numpy.minimum(offset_at + i, width - 1)]
+    is_utc = (chars[rows, numpy.maximum(lengths - 1, 0)] == ord('Z')) & \
+        (lengths - 1 >= leading)
+    zone_at = numpy.where(has_offset, offset_at,
+                          numpy.where(is_utc, lengths - 1, lengths))
+
+    # between the time and the zone there can only be fractional seconds
+    columns = numpy.arange(width)
+    in_fraction = (columns > leading[:, None]) & \
+        (columns < zone_at[:, None])
+    fraction_ok = (zone_at == leading) | \
+        ((chars[rows, numpy.minimum(leading, width - 1)] == ord('.')) &
+         (zone_at > leading + 1) & ~(in_fraction & ~digits).any(axis=1))
+
+    is_date = (leading == lengths) & \
+        ((leading == 4) | (leading == 6) | (leading == 8))
+    is_datetime = ((leading == 12) | (leading == 14)) & fraction_ok
+    regular = is_date | is_datetime
+
+    def field(start, size):
+        value = numpy.zeros(count, numpy.int64)
+        for i in range(size):
+            value = value * 10 + numbers[:, start + i]
+        return value
+
+    year = field(0, 4)
+    month = numpy.where(leading >= 6, field(4, 2), 1)
+    day = numpy.where(leading >= 8, field(6, 2), 1)
+    hour = numpy.where(is_datetime, field(8, 2), 0)
+    minute = numpy.where(is_datetime, field(10, 2), 0)
+    second = numpy.where(is_datetime & (leading == 14), field(12, 2), 0)
+
+    offset = numbers[rows, numpy.minimum(offset_at + 1, width - 1)] * 600 + \
+        numbers[rows, numpy.minimum(offset_at + 2, width - 1)] * 60 + \
+        numbers[rows, numpy.minimum(offset_at + 3, width - 1)] * 10 + \
+        numbers[rows, numpy.minimum(offset_at + 4, width - 1)]
+    offset = numpy.where(has_offset & is_datetime, offset, 0)
+    offset = numpy.where(offset_sign == ord('-'), -offset, offset)
+
+    valid = regular & (year >= 1800) & (month >= 1) & (month <= 12) & \
+        (hour < 24) & (minute < 60) & (second < 60) & \
+        (numpy.abs(offset) < 1440)
+    first_of_month = ((year - 1970) * 12 + numpy.clip(month, 1, 12) - 1) \
+        .astype('datetime64[M]')
+    days_in_month = ((first_of_month + 1).astype('datetime64[D]') -
+                     first_of_month.astype('datetime64[D]')) \
+        .astype(numpy.int64)
+    valid &= (day >= 1) & (day <= days_in_month)
+
+    days = first_of_month.astype('datetime64[D]').astype(numpy.int64) + day - 1
+    seconds = days * 86400 + hour * 3600 + minute * 60 + second - offset * 60
+    values[valid] = (seconds[valid] * 1000000).astype('datetime64[us]')
+    precision[valid] = numpy.where(
+        is_datetime, numpy.where(leading == 14, PRECISION_SECOND,
+                                 PRECISION_MINUTE),
+        numpy.where(leading == 4, PRECISION_YEAR,
+                    numpy.where(leading == 6, PRECISION_MONTH,
+                                PRECISION_DAY)))[valid]
+
+    # the odd ones out, one at a time
+    for i in numpy.flatnonzero(~regular & (lengths > 0)):
+        try:
+            value = parse_date(strings[i])
+            if isinstance(value, datetime.datetime):
+                # which fails for an offset of a day or more
+                value = (value - value.utcoffset()).replace(tzinfo=None)
+        except (ValueError, TypeError, OverflowError):
+            continue
+        if value is None:
+            continue
+        if isinstance(value, datetime.datetime):
+            precision[i] = PRECISION_SECOND if leading[i] >= 14 \
+                else PRECISION_MINUTE
+        else:
+            value = datetime.datetime(value.year, value.month, value.day)
+            precision[i] = PRECISION_YEAR if leading[i] <= 4 else \
+                PRECISION_MONTH if leading[i] < 8 else PRECISION_DAY
+        values[i] = numpy.datetime64(value, 'us')
+
+    return values, precision
+
+
 def parse_name(name_element):
     prefix = name_element.tag('prefix').val()
     els = name_element.els_by_tag('given')
     given = [e.val() for e in els if e.val()]
     family = name_element.tag('family').val()
 
-    return wrappers.ObjectWrapper(
+    return Name(
         prefix=prefix,
         given=given,
         family=family
@@ -4,7 +4,61 @@
 # Use of this source code is governed by the license found in the LICENSE file.
 ###############################################################################
 
+from collections import OrderedDict
+
 from .. import documents
+from ..core import wrappers
+from ..core import xml
+
+
+# templateIds identifying each section, in order of preference
+SECTIONS = OrderedDict([
+    ('document', ('2.16.840.1.113883.10.20.22.1.1',)),
+    ('allergies', ('2.16.840.1.113883.10.20.22.2.6.1',)),
+    ('care_plan', ('2.16.840.1.113883.10.20.22.2.10',)),
+    ('chief_complaint', ('2.16.840.1.113883.10.20.22.2.13',
+                         '1.3.6.1.4.1.19376.1.5.3.1.1.13.2.1')),
+    ('demographics', ('2.16.840.1.113883.10.20.22.1.1',)),
+    ('encounters', ('2.16.840.1.113883.10.20.22.2.22',
+                    '2.16.840.1.113883.10.20.22.2.22.1')),
+    ('functional_statuses', ('2.16.840.1.113883.10.20.22.2.14',)),
+    ('immunizations', ('2.16.840.1.113883.10.20.22.2.2.1',
+                       '2.16.840.1.113883.10.20.22.2.2')),
+    ('instructions', ('2.16.840.1.113883.10.20.22.2.45',)),
+    ('results', ('2.16.840.1.113883.10.20.22.2.3.1',
+                 '2.16.840.1.113883.10.20.22.2.3')),
+    ('medications', ('2.16.840.1.113883.10.20.22.2.1.1',
+                     '2.16.840.1.113883.10.20.22.2.1')),
+    ('problems', ('2.16.840.1.113883.10.20.22.2.5.1',
+                  '2.16.840.1.113883.10.20.22.2.5')),
+    ('procedures', ('2.16.840.1.113883.10.20.22.2.7.1',
+                    '2.16.840.1.113883.10.20.22.2.7')),
+    ('social_history', ('2.16.840.1.113883.10.20.22.2.17',)),
+    ('vitals', ('2.16.840.1.113883.10.20.22.2.4.1',
+                '2.16.840.1.113883.10.20.22.2.4')),
+])
+
+# "Sections" that are really the document header
+HEADER_SECTIONS = ('document', 'demographics')
+
+# Sections that have no <entry> elements to parse
+WITHOUT_ENTRIES = HEADER_SECTIONS + ('chief_complaint',)
+
+# A section that scan() found: the templateId that section() would find it
+# by, and the number of <entry> elements in it (None where section() gives
+# no entries: the header, the chief complaint and a medications section
+# found by its fallback templateId)
+SectionPresence = wrappers.record('SectionPresence',
+                                  ['name', 'template_id', 'entries'])
+
+# Where iter_code() found a code: the name of the section it's in (None
+# outside the known SECTIONS), the position among the section's own <entry>
+# elements (not those nested in entries) of the one it's in (None outside
+# entries), and the element that has it
+CodeMatch = wrappers.record('CodeMatch', ['section', 'entry', 'tag'])
+
+# Elements whose code iter_code() looks for
+CODED_TAGS = ('code', 'value', 'translation')
 
 
 def process(ccda):
@@ -19,80 +73,177 @@ def section(ccda, name):
     """
     Finds the section of a CCDA document
     """
+    if name not in SECTIONS:
+        return None
 
-    entries = documents.entries
-
-    if 'document' == name:
-        return ccda.template('2.16.840.1.113883.10.20.22.1.1')
-    if 'allergies' == name:
-        el = ccda.template('2.16.840.1.113883.10.20.22.2.6.1')
-        el.entries = entries
-        return el
-    if 'care_plan' == name:
-        el = ccda.template('2.16.840.1.113883.10.20.22.2.10')
-        el.entries = entries
-        return el
-    if 'chief_complaint' == name:
-        el = ccda.template('2.16.840.1.113883.10.20.22.2.13')
-        if el.is_empty():
-            el = ccda.template('1.3.6.1.4.1.19376.1.5.3.1.1.13.2.1')
-        # no entries in Chief Complaint
-        return el
-    if 'demographics' == name:
-        return ccda.template('2.16.840.1.113883.10.20.22.1.1')
-    if 'encounters' == name:
-        el = ccda.template('2.16.840.1.113883.10.20.22.2.22')
-        if el.is_empty():
-            el = ccda.template('2.16.840.1.113883.10.20.22.2.22.1')
-        el.entries = entries
-        return el
-    if 'functional_statuses' == name:
-        el = ccda.template('2.16.840.1.113883.10.20.22.2.14')
-        el.entries = entries
-        return el
-    if 'immunizations' == name:
-        el = ccda.template('2.16.840.1.113883.10.20.22.2.2.1')
-        if el.is_empty():
-            el = ccda.template('2.16.840.1.113883.10.20.22.2.2')
-        el.entries = entries
-        return el
-    if 'instructions' == name:
-        el = ccda.template('2.16.840.1.113883.10.20.22.2.45')
-        el.entries = entries
-        return el
-    if 'results' == name:
-        el = ccda.template('2.16.840.1.113883.10.20.22.2.3.1')
-        if el.is_empty():
-            el = ccda.template('2.16.840.1.113883.10.20.22.2.3')
-        el.entries = entries
-        return el
-    if 'medications' == name:
-        el = ccda.template('2.16.840.1.113883.10.20.22.2.1.1')
-        el.entries = entries
-        if el.is_empty():
-            el = ccda.template('2.16.840.1.113883.10.20.22.2.1')
-        return el
-    if 'problems' == name:
-        el = ccda.template('2.16.840.1.113883.10.20.22.2.5.1')
-        if el.is_empty():
-            el = ccda.template('2.16.840.1.113883.10.20.22.2.5')
-        el.entries = entries
-        return el
-    if 'procedures' == name:
-        el = ccda.template('2.16.840.1.113883.10.20.22.2.7.1')
-        if el.is_empty():
-            el = ccda.template('2.16.840.1.113883.10.20.22.2.7')
-        el.entries = entries
-        return el
-    if 'social_history' == name:
-        el = ccda.template('2.16.840.1.113883.10.20.22.2.17')
-        el.entries = entries
-        return el
-    if 'vitals' == name:
-        el = ccda.template('2.16.840.1.113883.10.20.22.2.4.1')
-        if el.is_empty():
-            el = ccda.template('2.16.840.1.113883.10.20.22.2.4')
-        el.entries = entries
-        return el
+    template_ids = SECTIONS[name]
+    el = ccda.template(template_ids[0])
+    fallback = False
+    for template_id in template_ids[1:]:
+        if not el.is_empty():
+            break
+        el = ccda.template(template_id)
+        fallback = True
 
+    # a medications section only found by its fallback templateId doesn't
+    # get entries (as in BlueButton.js)
+    if name not in WITHOUT_ENTRIES and \
+            not (fallback and 'medications' == name):
+        el.entries = documents.entries
+    return el
+
+
+def section_rank(ccda, name):
+    """
+    Returns the position in SECTIONS[name] of the templateId that section()
+    would find the section by, or None if the document doesn't have it
+    """
+    for rank, template_id in enumerate(SECTIONS.get(name, ())):
+        if not ccda.template(template_id).is_empty():
+            return rank
     return None
+
+
+def scan(source, backend=None):
+    """
+    Returns a SectionPresence for each of the SECTIONS that the CCDA
+    `source` (an XML string or a file-like object) has, in SECTIONS order:
+    the same sections as section() would find, with as many entries as it
+    would (or None where it gives none). The document is read once as a
+    stream, clearing elements as it goes, rather than parsed.
+    """
+    template_tag = xml.NAMESPACE + 'templateId'
+    entry_tag = xml.NAMESPACE + 'entry'
+    template_ids = set(template_id for ids in SECTIONS.values()
+                       for template_id in ids)
+
+    # templateId => entries in the element holding its first occurrence,
+    # once that element has ended
+    found = {}
+    entries = 0
+    # the open elements, and the entries seen before each started
+    stack = []
+    started = []
+    # (depth, templateId) for the open elements holding the first
+    # occurrence of a templateId, innermost last
+    holders = []
+    for event, el in xml.iterparse(source, backend):
+        if 'start' == event:
+            tag = el.tag
+            if tag == entry_tag:
+                entries += 1
+            elif tag == template_tag:
+                template_id = el.get('root')
+                if template_id in template_ids and \
+                        template_id not in found and stack:
+                    found[template_id] = None
+                    holders.append((len(stack) - 1, template_id))
+            stack.append(el)
+            started.append(entries)
+            continue
+
+        stack.pop()
+        before = started.pop()
+        while holders and holders[-1][0] == len(stack):
+            found[holders.pop()[1]] = entries - before
+
+        el.clear()
+        if stack:
+            stack[-1].remove(el)
+
+    presence = []
+    for name, ids in SECTIONS.items():
+        for rank, template_id in enumerate(ids):
+            if template_id in found:
+                # as section() does
+                without_entries = name in WITHOUT_ENTRIES or \
+                    (rank and 'medications' == name)
+                presence.append(SectionPresence(
+                    name=name, template_id=template_id,
+                    entries=None if without_entries
+                    else found[template_id]))
+                break
+    return presence
+
+
+def iter_code(source, code, code_system=None, backend=None):
+    """
+    Yields a CodeMatch for each <code>, <value> or <translation> element of
+    `source` (an XML string or a file-like object) with the given `code` and
+    (if given) `codeSystem`, in document order, reading the document as a
+    stream: with lxml, only the elements involved are seen from Python at
+    all. Stop iterating once you have what you need (see has_code).
+
+    A string `source` that doesn't contain `code` anywhere isn't read
+    at all, so a code written with character references isn't found.
+    """
+    if isinstance(source, basestring):
+        # in the document's type, as a unicode code can't be looked for in
+        # a non-ASCII byte string
+        needle = code
+        if isinstance(source, str) and isinstance(code, unicode):
+            needle = code.encode('utf-8')
+        elif isinstance(source, unicode) and isinstance(code, str):
+            needle = code.decode('utf-8')
+        if needle not in source:
+            return
+
+    section_tag = xml.NAMESPACE + 'section'
+    entry_tag = xml.NAMESPACE + 'entry'
+    template_tag = xml.NAMESPACE + 'templateId'
+    coded_tags = dict((xml.NAMESPACE + tag, tag) for tag in CODED_TAGS)
+    names = {}
+    for name, template_ids in SECTIONS.items():
+        if name not in HEADER_SECTIONS:
+            for template_id in template_ids:
+                names[template_id] = name
+
+    # for each open section: [name, its own entries so far (not counting
+    # those nested in entries), position of the open one, open entries]
+    sections = []
+    tags = (section_tag, entry_tag, template_tag) + tuple(coded_tags)
+    for event, el in xml.iterparse(source, backend, tags):
+        tag = el.tag
+        if 'start' == event:
+            if tag in coded_tags:
+                if el.get('code') == code and (
+                        code_system is None or
+                        el.get('codeSystem') == code_system):
+                    name, entry = None, None
+                    if sections:
+                        name, _, entry, open_entries = sections[-1]
+                        if not open_entries:
+                            entry = None
+                    yield CodeMatch(section=name, entry=entry,
+                                    tag=coded_tags[tag])
+            elif tag == entry_tag:
+                if sections:
+                    section = sections[-1]
+                    if not section[3]:
+                        section[2] = section[1]
+                        section[1] += 1
+                    section[3] += 1
+            elif tag == template_tag:
+                if sections and sections[-1][0] is None:
+                    sections[-1][0] = names.get(el.get('root'))
+            elif tag == section_tag:
+                sections.append([None, 0, None, 0])
+            continue
+
+        if tag == entry_tag:
+            if sections:
+                sections[-1][3] -= 1
+            el.clear()
+        elif tag == section_tag:
+            sections.pop()
+            el.clear()
+
+
+def has_code(source, code, code_system=None, backend=None):
+    """
+    Returns whether `source` has the code (see iter_code), stopping at the
+    first match
+    """
+    for _ in iter_code(source, code, code_system, backend):
+        return True
+    return False
@@ -8,11 +8,16 @@
 Parser for the CCDA allergies section
 """
 
-from ...documents import parse_date
+from ...documents import parse_date, Code, Concept, DateRange
 from ...core import wrappers
 from ... import core
 
 
+Allergy = wrappers.record('Allergy', [
+    'date_range', 'name', 'code', 'code_system', 'code_system_name', 'status',
+    'severity', 'reaction', 'reaction_type', 'allergen'])
+
+
 def allergies(ccda):
 
     data = []
@@ -71,8 +76,8 @@ def allergies(ccda):
         el = entry.template('2.16.840.1.113883.10.20.22.4.28').tag('value')
         status = el.attr('displayName')
 
-        data.append(wrappers.ObjectWrapper(
-            date_range=wrappers.ObjectWrapper(
+        data.append(Allergy(
+            date_range=DateRange.of(
                 start=start_date,
                 end=end_date
             ),
@@ -82,18 +87,18 @@ def allergies(ccda):
             code_system_name=code_system_name,
             status=status,
             severity=severity,
-            reaction=wrappers.ObjectWrapper(
+            reaction=Code.of(
                 name=reaction_name,
                 code=reaction_code,
                 code_system=reaction_code_system
             ),
-            reaction_type=wrappers.ObjectWrapper(
+            reaction_type=Concept.of(
                 name=reaction_type_name,
                 code=reaction_type_code,
                 code_system=reaction_type_code_system,
                 code_system_name=reaction_type_code_system_name
             ),
-            allergen=wrappers.ObjectWrapper(
+            allergen=Concept.of(
                 name=allergen_name,
                 code=allergen_code,
                 code_system=allergen_code_system,
@@ -10,6 +10,10 @@ from bluebutton import documents
 from ...core import wrappers
 
 
+CarePlanEntry = wrappers.record('CarePlanEntry', [
+    'text', 'name', 'code', 'code_system', 'code_system_name'])
+
+
 def care_plan(ccda):
 
     data = []
@@ -38,7 +42,7 @@ def care_plan(ccda):
         text = core.strip_whitespace(entry.tag('text').val())
 
         data.append(
-            wrappers.ObjectWrapper(
+            CarePlanEntry(
                 text=text,
                 name=name,
                 code=code,
@@ -10,6 +10,19 @@ from bluebutton import documents
 from ...core import wrappers
 
 
+Demographics = wrappers.record('Demographics', [
+    'name', 'dob', 'gender', 'marital_status', 'address', 'phone', 'email',
+    'language', 'race', 'ethnicity', 'religion', 'birthplace', 'guardian',
+    'provider'])
+Phone = wrappers.record('Phone', ['home', 'work', 'mobile'])
+Birthplace = wrappers.record('Birthplace', ['state', 'zip', 'country'])
+Guardian = wrappers.record('Guardian', [
+    'name', 'relationship', 'relationship_code', 'address', 'phone'])
+GuardianName = wrappers.record('GuardianName', ['given', 'family'])
+GuardianPhone = wrappers.record('GuardianPhone', ['home'])
+Provider = wrappers.record('Provider', ['organization', 'phone', 'address'])
+
+
 def demographics(ccda):
     parse_date = documents.parse_date
     parse_name = documents.parse_name
@@ -61,13 +74,13 @@ def demographics(ccda):
 
     provider_address_dict = parse_address(el.tag('addr'))
 
-    return wrappers.ObjectWrapper(
+    return Demographics(
         name=patient_name_dict,
         dob=dob,
         gender=gender,
         marital_status=marital_status,
         address=patient_address_dict,
-        phone=wrappers.ObjectWrapper(
+        phone=Phone.of(
             home=home,
             work=work,
             mobile=mobile
@@ -77,24 +90,24 @@ def demographics(ccda):
         race=race,
         ethnicity=ethnicity,
         religion=religion,
-        birthplace=wrappers.ObjectWrapper(
+        birthplace=Birthplace.of(
             state=birthplace_dict.state,
             zip=birthplace_dict.zip,
             country=birthplace_dict.country
         ),
-        guardian=wrappers.ObjectWrapper(
-            name=wrappers.ObjectWrapper(
+        guardian=Guardian(
+            name=GuardianName(
                 given=guardian_name_dict.given,
                 family=guardian_name_dict.family
             ),
             relationship=guardian_relationship,
             relationship_code=guardian_relationship_code,
             address=guardian_address_dict,
-            phone=wrappers.ObjectWrapper(
+            phone=GuardianPhone.of(
                 home=guardian_home
             )
         ),
-        provider=wrappers.ObjectWrapper(
+        provider=Provider(
             organization=provider_organization,
             phone=provider_phone,
             address=provider_address_dict
@@ -13,6 +13,14 @@ from ... import core
 from ... import documents
 
 
+Document = wrappers.record('Document', [
+    'date', 'title', 'author', 'documentation_of', 'location'])
+Author = wrappers.record('Author', ['name', 'address', 'phone'])
+Performer = wrappers.record('Performer', ['name', 'phone', 'address'])
+WorkPhone = wrappers.record('WorkPhone', ['work'])
+Location = wrappers.record('Location', ['name', 'address', 'encounter_date'])
+
+
 def document(ccda):
 
     parse_date = documents.parse_date
@@ -41,9 +49,9 @@ def document(ccda):
         performer_name_dict = parse_name(el)
         performer_phone = el.tag('telecom').attr('value')
         performer_addr = parse_address(el.tag('addr'))
-        documentation_of_list.append(wrappers.ObjectWrapper(
+        documentation_of_list.append(Performer(
             name=performer_name_dict,
-            phone=wrappers.ObjectWrapper(
+            phone=WorkPhone.of(
                 work=performer_phone
             ),
             address=performer_addr
@@ -58,18 +66,18 @@ def document(ccda):
     if not el.is_empty():
         encounter_date = parse_date(el.attr('value'))
 
-    data = wrappers.ObjectWrapper(
+    data = Document(
         date=date,
         title=title,
-        author=wrappers.ObjectWrapper(
+        author=Author(
             name=name_dict,
             address=address_dict,
-            phone=wrappers.ObjectWrapper(
+            phone=WorkPhone.of(
                 work=work_phone
             )
         ),
         documentation_of=documentation_of_list,
-        location=wrappers.ObjectWrapper(
+        location=Location(
             name=location_name,
             address=location_addr_dict,
             encounter_date=encounter_date
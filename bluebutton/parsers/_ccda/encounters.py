@@ -9,7 +9,15 @@ Parser for the CCDA encounters section
 """
 
 from ...core import wrappers
-from ...documents import parse_address, parse_date
+from ...documents import parse_address, parse_date, Code, Concept
+
+
+Encounter = wrappers.record('Encounter', [
+    'date', 'name', 'code', 'code_system', 'code_system_name',
+    'code_system_version', 'findings', 'translation', 'performer',
+    'location'])
+Location = wrappers.record('Location', [
+    'street', 'city', 'state', 'zip', 'country', 'organization'])
 
 
 def encounters(ccda):
@@ -47,21 +55,21 @@ def encounters(ccda):
         el = entry.tag('participant')
         organization = el.tag('code').attr('displayName')
         
-        location_dict = parse_address(el)
-        location_dict.organization = organization
+        location_dict = Location(organization=organization,
+                                 **parse_address(el)._asdict())
     
         # findings
         findings = []
         findings_els = entry.els_by_tag('entryRelationship')
         for current in findings_els:
             el = current.tag('value')
-            findings.append(wrappers.ObjectWrapper(
+            findings.append(Code.of(
                 name=el.attr('displayName'),
                 code=el.attr('code'),
                 code_system=el.attr('codeSystem'),
             ))
 
-        data.append(wrappers.ObjectWrapper(
+        data.append(Encounter(
             date=date,
             name=name,
             code=code,
@@ -69,13 +77,13 @@ def encounters(ccda):
             code_system_name=code_system_name,
             code_system_version=code_system_version,
             findings=findings,
-            translation=wrappers.ObjectWrapper(
+            translation=Concept.of(
                 name=translation_name,
                 code=translation_code,
                 code_system=translation_code_system,
                 code_system_name=translation_code_system_name
             ),
-            performer=wrappers.ObjectWrapper(
+            performer=Concept.of(
                 name=performer_name,
                 code=performer_code,
                 code_system=performer_code_system,
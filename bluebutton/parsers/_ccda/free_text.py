@@ -11,11 +11,14 @@ from ... import core
 from bluebutton.core import wrappers
 
 
+FreeText = wrappers.record('FreeText', ['text'])
+
+
 def free_text(ccda, section_name):
 
     doc = ccda.section(section_name)
     text = core.strip_whitespace(doc.tag('text').val())
 
-    return wrappers.ObjectWrapper(
+    return FreeText(
         text=text
     )
\ No newline at end of file
@@ -11,6 +11,10 @@ from ... import documents
 from ...core import wrappers
 
 
+FunctionalStatus = wrappers.record('FunctionalStatus', [
+    'date', 'name', 'code', 'code_system', 'code_system_name'])
+
+
 def functional_statuses(ccda):
 
     parse_date = documents.parse_date
@@ -32,7 +36,7 @@ def functional_statuses(ccda):
         code_system = el.attr('codeSystem')
         code_system_name = el.attr('codeSystemName')
 
-        data.append(wrappers.ObjectWrapper(
+        data.append(FunctionalStatus(
             date=date,
             name=name,
             code=code,
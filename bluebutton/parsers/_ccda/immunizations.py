@@ -10,6 +10,15 @@ Parser for the CCDA immunizations section
 from ... import documents
 from ...core import wrappers
 from ... import core
+from ...documents import Code, Concept, Quantity
+
+
+Immunization = wrappers.record('Immunization', [
+    'date', 'product', 'dose_quantity', 'route', 'instructions',
+    'education_type'])
+Product = wrappers.record('Product', [
+    'name', 'code', 'code_system', 'code_system_name', 'translation',
+    'lot_number', 'manufacturer_name'])
 
 
 def immunizations(ccda):
@@ -76,14 +85,14 @@ def immunizations(ccda):
         dose_unit = el.attr('unit')
 
         data = declined_data if declined else administered_data
-        data.append(wrappers.ObjectWrapper(
+        data.append(Immunization(
             date=date,
-            product=wrappers.ObjectWrapper(
+            product=Product(
                 name=product_name,
                 code=product_code,
                 code_system=product_code_system,
                 code_system_name=product_code_system_name,
-                translation=wrappers.ObjectWrapper(
+                translation=Concept.of(
                     name=translation_name,
                     code=translation_code,
                     code_system=translation_code_system,
@@ -92,18 +101,18 @@ def immunizations(ccda):
                 lot_number=lot_number,
                 manufacturer_name=manufacturer_name,
             ),
-            dose_quantity=wrappers.ObjectWrapper(
+            dose_quantity=Quantity.of(
                 value=dose_value,
                 unit=dose_unit,
             ),
-            route=wrappers.ObjectWrapper(
+            route=Concept.of(
                 name=route_name,
                 code=route_code,
                 code_system=route_code_system,
                 code_system_name=route_code_system_name
             ),
             instructions=instructions_text,
-            education_type=wrappers.ObjectWrapper(
+            education_type=Code.of(
                 name=education_name,
                 code=education_code,
                 code_system=education_code_system,
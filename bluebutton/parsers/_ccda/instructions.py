@@ -11,6 +11,10 @@ from ...core import wrappers
 from ... import core
 
 
+Instruction = wrappers.record('Instruction', [
+    'text', 'name', 'code', 'code_system', 'code_system_name'])
+
+
 def instructions(ccda):
 
     data = wrappers.ListWrapper()
@@ -27,7 +31,7 @@ def instructions(ccda):
 
         text = core.strip_whitespace(entry.tag('text').val())
 
-        data.append(wrappers.ObjectWrapper(
+        data.append(Instruction(
             text=text,
             name=name,
             code=code,
@@ -11,6 +11,17 @@ Parser for the CCDA medications section
 from ...core import wrappers
 from ... import core
 from ... import documents
+from ...documents import Code, Concept, DateRange, Quantity
+
+
+Medication = wrappers.record('Medication', [
+    'date_range', 'text', 'product', 'dose_quantity', 'rate_quantity',
+    'precondition', 'reason', 'route', 'schedule', 'vehicle',
+    'administration', 'prescriber'])
+Product = wrappers.record('Product', [
+    'name', 'code', 'code_system', 'text', 'translation'])
+Schedule = wrappers.record('Schedule', ['type', 'period_value', 'period_unit'])
+Prescriber = wrappers.record('Prescriber', ['organization', 'person'])
 
 
 def medications(ccda):
@@ -126,66 +137,66 @@ def medications(ccda):
             prescriber_organization = el.tag('name').val()
             prescriber_person = None
 
-            data.append(wrappers.ObjectWrapper(
-                date_range=wrappers.ObjectWrapper(
+            data.append(Medication(
+                date_range=DateRange.of(
                     start=start_date,
                     end=end_date
                 ),
                 text=sig,
-                product=wrappers.ObjectWrapper(
+                product=Product(
                     name=product_name,
                     code=product_code,
                     code_system=product_code_system,
                     text=product_original_text,
-                    translation=wrappers.ObjectWrapper(
+                    translation=Concept.of(
                         name=translation_name,
                         code=translation_code,
                         code_system=translation_code_system,
                         code_system_name=translation_code_system_name
                     )
                 ),
-                dose_quantity=wrappers.ObjectWrapper(
+                dose_quantity=Quantity.of(
                     value=dose_value,
                     unit=dose_unit
                 ),
-                rate_quantity=wrappers.ObjectWrapper(
+                rate_quantity=Quantity.of(
                     value=rate_quantity_value,
                     unit=rate_quantity_unit
                 ),
-                precondition=wrappers.ObjectWrapper(
+                precondition=Code.of(
                     name=precondition_name,
                     code=precondition_code,
                     code_system=precondition_code_system
                 ),
-                reason=wrappers.ObjectWrapper(
+                reason=Code.of(
                     name=reason_name,
                     code=reason_code,
                     code_system=reason_code_system
                 ),
-                route=wrappers.ObjectWrapper(
+                route=Concept.of(
                     name=route_name,
                     code=route_code,
                     code_system=route_code_system,
                     code_system_name=route_code_system_name
                 ),
-                schedule=wrappers.ObjectWrapper(
+                schedule=Schedule.of(
                     type=schedule_type,
                     period_value=schedule_period_value,
                     period_unit=schedule_period_unit
                 ),
-                vehicle=wrappers.ObjectWrapper(
+                vehicle=Concept.of(
                     name=vehicle_name,
                     code=vehicle_code,
                     code_system=vehicle_code_system,
                     code_system_name=vehicle_code_system_name
                 ),
-                administration=wrappers.ObjectWrapper(
+                administration=Concept.of(
                     name=administration_name,
                     code=administration_code,
                     code_system=administration_code_system,
                     code_system_name=administration_code_system_name
                 ),
-                prescriber=wrappers.ObjectWrapper(
+                prescriber=Prescriber.of(
                     organization=prescriber_organization,
                     person=prescriber_person
                 )
@@ -11,6 +11,12 @@ Parser for the CCDA problems section
 from ...core import wrappers
 from ... import core
 from ... import documents
+from ...documents import Concept, DateRange
+
+
+Problem = wrappers.record('Problem', [
+    'date_range', 'name', 'status', 'age', 'code', 'code_system',
+    'code_system_name', 'translation', 'comment'])
 
 
 def problems(ccda):
@@ -49,8 +55,8 @@ def problems(ccda):
         el = entry.template('2.16.840.1.113883.10.20.22.4.64')
         comment = core.strip_whitespace(el.tag('text').val())
 
-        data.append(wrappers.ObjectWrapper(
-            date_range=wrappers.ObjectWrapper(
+        data.append(Problem(
+            date_range=DateRange.of(
                 start=start_date,
                 end=end_date
             ),
@@ -60,7 +66,7 @@ def problems(ccda):
             code=code,
             code_system=code_system,
             code_system_name=code_system_name,
-            translation=wrappers.ObjectWrapper(
+            translation=Concept.of(
                 name=translation_name,
                 code=translation_code,
                 code_system=translation_code_system,
@@ -11,6 +11,13 @@ Parser for the CCDA procedures section
 from ...core import wrappers
 from ... import core
 from ... import documents
+from ...documents import Code
+
+
+Procedure = wrappers.record('Procedure', [
+    'date', 'name', 'code', 'code_system', 'specimen', 'performer', 'device'])
+Performer = wrappers.record('Performer', [
+    'street', 'city', 'state', 'zip', 'country', 'organization', 'phone'])
 
 
 def procedures(ccda):
@@ -56,9 +63,8 @@ def procedures(ccda):
         organization = el.tag('name').val()
         phone = el.tag('telecom').attr('value')
 
-        performer_dict = parse_address(el)
-        performer_dict.organization = organization
-        performer_dict.phone = phone
+        performer_dict = Performer(organization=organization, phone=phone,
+                                   **parse_address(el)._asdict())
 
         # participant => device
         el = entry.template('2.16.840.1.113883.10.20.22.4.37').tag('code')
@@ -66,18 +72,18 @@ def procedures(ccda):
         device_code = el.attr('code')
         device_code_system = el.attr('codeSystem')
 
-        data.append(wrappers.ObjectWrapper(
+        data.append(Procedure(
             date=date,
             name=name,
             code=code,
             code_system=code_system,
-            specimen=wrappers.ObjectWrapper(
+            specimen=Code.of(
                 name=specimen_name,
                 code=specimen_code,
                 code_system=specimen_code_system
             ),
             performer=performer_dict,
-            device=wrappers.ObjectWrapper(
+            device=Code.of(
                 name=device_name,
                 code=device_code,
                 code_system=device_code_system
@@ -10,6 +10,16 @@ Parser for the CCDA results (labs) section
 from ...core import wrappers
 from ... import core
 from ... import documents
+from ...documents import Concept
+
+
+Panel = wrappers.record('Panel', [
+    'name', 'code', 'code_system', 'code_system_name', 'tests'])
+Test = wrappers.record('Test', [
+    'date', 'name', 'value', 'unit', 'code', 'code_system',
+    'code_system_name', 'translation', 'reference_range'])
+ReferenceRange = wrappers.record('ReferenceRange', [
+    'text', 'low_unit', 'low_value', 'high_unit', 'high_value'])
 
 
 def results(ccda):
@@ -69,7 +79,7 @@ def results(ccda):
             reference_range_high_unit = el.tag('observationRange').tag('high').attr('unit')
             reference_range_high_value = el.tag('observationRange').tag('high').attr('value')
 
-            tests_data.append(wrappers.ObjectWrapper(
+            tests_data.append(Test(
                 date=date,
                 name=name,
                 value=value,
@@ -77,13 +87,13 @@ def results(ccda):
                 code=code,
                 code_system=code_system,
                 code_system_name=code_system_name,
-                translation=wrappers.ObjectWrapper(
+                translation=Concept.of(
                     name=translation_name,
                     code=translation_code,
                     code_system=translation_code_system,
                     code_system_name=translation_code_system_name
                 ),
-                reference_range=wrappers.ObjectWrapper(
+                reference_range=ReferenceRange.of(
                     text=reference_range_text,
                     low_unit=reference_range_low_unit,
                     low_value=reference_range_low_value,
@@ -92,7 +102,7 @@ def results(ccda):
                 )
             ))
 
-        data.append(wrappers.ObjectWrapper(
+        data.append(Panel(
             name=panel_name,
             code=panel_code,
             code_system=panel_code_system,
@@ -0,0 +1,239 @@
+###############################################################################
+# Copyright 2015 University of Florida. All rights reserved.
+# This file is part of the BlueButton.py project.
+# Use of this source code is governed by the license found in the LICENSE file.
+###############################################################################
+
+"""
+The shape of each field of a parsed CCDA, for loading the JSON of one back
+into records and wrappers (see parsers.ccda.run_json)
+"""
+import datetime
+import re
+
+from ...core import wrappers
+from ...documents import Address, Code, Concept, DateRange, Name, Quantity
+from . import allergies
+from . import care_plan
+from . import demographics
+from . import document
+from . import encounters
+from . import free_text
+from . import functional_statuses
+from . import immunizations
+from . import instructions
+from . import medications
+from . import problems
+from . import procedures
+from . import results
+from . import smoking_status
+from . import vitals
+
+
+# a date or datetime, as JSONEncoder writes them
+DATE = object()
+
+
+class Many(object):
+    """
+    A ListWrapper of values shaped like `spec`
+    """
+    def __init__(self, spec):
+        self.spec = spec
+
+
+# A spec is DATE, a record class (whose fields are plain values), a
+# (record class, {field: spec}) pair, Many(spec) or [spec] for a plain list,
+# or None for a plain value
+_DATE_RANGE = (DateRange, {'start': DATE, 'end': DATE})
+
+SCHEMA = {
+    'document': (document.Document, {
+        'date': DATE,
+        'author': (document.Author, {
+            'name': Name,
+            'address': Address,
+            'phone': document.WorkPhone,
+        }),
+        'documentation_of': Many((document.Performer, {
+            'name': Name,
+            'phone': document.WorkPhone,
+            'address': Address,
+        })),
+        'location': (document.Location, {
+            'address': Address,
+            'encounter_date': DATE,
+        }),
+    }),
+    'allergies': Many((allergies.Allergy, {
+        'date_range': _DATE_RANGE,
+        'reaction': Code,
+        'reaction_type': Concept,
+        'allergen': Concept,
+    })),
+    'care_plan': Many(care_plan.CarePlanEntry),
+    'chief_complaint': free_text.FreeText,
+    'demographics': (demographics.Demographics, {
+        'name': Name,
+        'dob': DATE,
+        'address': Address,
+        'phone': demographics.Phone,
+        'birthplace': demographics.Birthplace,
+        'guardian': (demographics.Guardian, {
+            'name': demographics.GuardianName,
+            'address': Address,
+            'phone': demographics.GuardianPhone,
+        }),
+        'provider': (demographics.Provider, {
+            'address': Address,
+        }),
+    }),
+    'encounters': Many((encounters.Encounter, {
+        'date': DATE,
+        'findings': [Code],
+        'translation': Concept,
+        'performer': Concept,
+        'location': encounters.Location,
+    })),
+    'functional_statuses': Many((functional_statuses.FunctionalStatus, {
+        'date': DATE,
+    })),
+    'immunizations': Many((immunizations.Immunization, {
+        'date': DATE,
+        'product': (immunizations.Product, {
+            'translation': Concept,
+        }),
+        'dose_quantity': Quantity,
+        'route': Concept,
+        'education_type': Code,
+    })),
+    'instructions': Many(instructions.Instruction),
+    'results': Many((results.Panel, {
+        'tests': Many((results.Test, {
+            'date': DATE,
+            'translation': Concept,
+            'reference_range': results.ReferenceRange,
+        })),
+    })),
+    'medications': Many((medications.Medication, {
+        'date_range': _DATE_RANGE,
+        'product': (medications.Product, {
+            'translation': Concept,
+        }),
+        'dose_quantity': Quantity,
+        'rate_quantity': Quantity,
+        'precondition': Code,
+        'reason': Code,
+        'route': Concept,
+        'schedule': medications.Schedule,
+        'vehicle': Concept,
+        'administration': Concept,
+        'prescriber': medications.Prescriber,
+    })),
+    'problems': Many((problems.Problem, {
+        'date_range': _DATE_RANGE,
+        'translation': Concept,
+    })),
+    'procedures': Many((procedures.Procedure, {
+        'date': DATE,
+        'specimen': Code,
+        'performer': procedures.Performer,
+        'device': Code,
+    })),
+    'smoking_status': (smoking_status.SmokingStatus, {
+        'date': DATE,
+    }),
+    'vitals': Many((vitals.Vital, {
+        'date': DATE,
+        'results': Many(vitals.VitalResult),
+    })),
+}
+SCHEMA['immunization_declines'] = SCHEMA['immunizations']
+
+
+def load(field, value):
+    """
+    Returns the value of `field` of a parsed document from its JSON (as
+    json.loads returns it)
+    """
+    return _LOADERS[field](value)
+
+
+_DATETIME_RE = re.compile(
+    r'^(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)(?:\.(\d{6}))?Z$')
+_DATE_RE = re.compile(r'^(\d\d)/(\d\d)/(\d{4})$')
+
+
+def _loader(spec, path):
+    # a function loading a value shaped like `spec`, found at `path` (for
+    # error messages)
+    if spec is DATE:
+        return lambda value: _load_date(value, path)
+
+    if isinstance(spec, Many):
+        load = _list_loader(spec.spec, path)
+        return lambda value: wrappers.ListWrapper(load(value))
+
+    if isinstance(spec, list):
+        return _list_loader(spec[0], path)
+
+    return _record_loader(spec, path)
+
+
+def _list_loader(spec, path):
+    load = _loader(spec, path)
+
+    def load_list(value):
+        if type(value) is not list:
+            raise ValueError('Expected a list for %s, got %r' % (path, value))
+        return [None if item is None else load(item) for item in value]
+    return load_list
+
+
+def _record_loader(spec, path):
+    cls, fields = spec if isinstance(spec, tuple) else (spec, {})
+    known = frozenset(cls._fields)
+    of = cls.of
+    loaders = [(name, _loader(field_spec, path + '.' + name))
+               for name, field_spec in fields.items()]
+
+    def load_record(value):
+        if type(value) is not dict:
+            raise ValueError('Expected an object for %s, got %r'
+                             % (path, value))
+        if not known.issuperset(value):
+            raise ValueError('Unknown fields for %s: %s' % (
+                path, ', '.join(sorted(set(value) - known))))
+
+        # json.loads' dicts are the caller's, so load into a copy
+        kwargs = dict(value)
+        for name, load in loaders:
+            item = kwargs.get(name)
+            if item is not None:
+                kwargs[name] = load(item)
+        return of(**kwargs)
+    return load_record
+
+
+def _load_date(value, path):
+    if not isinstance(value, basestring):
+        raise ValueError('Expected a date for %s, got %r' % (path, value))
+
+    match = _DATETIME_RE.match(value)
+    if match is not None:
+        year, month, day, hour, minute, second, microsecond = match.groups()
+        return datetime.datetime(
+            int(year), int(month), int(day), int(hour), int(minute),
+            int(second), int(microsecond or 0), wrappers.FixedOffset.UTC())
+
+    match = _DATE_RE.match(value)
+    if match is not None:
+        month, day, year = match.groups()
+        return datetime.date(int(year), int(month), int(day))
+
+    raise ValueError('Expected a date for %s, got %r' % (path, value))
+
+
+# field => function loading it
+_LOADERS = dict((field, _loader(spec, field))
+                for field, spec in SCHEMA.items())
@@ -12,6 +12,10 @@ from ...core import wrappers
 from ... import documents
 
 
+SmokingStatus = wrappers.record('SmokingStatus', [
+    'date', 'name', 'code', 'code_system', 'code_system_name'])
+
+
 def smoking_status(ccda):
 
     parse_date = documents.parse_date
@@ -49,7 +53,7 @@ def smoking_status(ccda):
         if name:
             break
 
-    data = wrappers.ObjectWrapper(
+    data = SmokingStatus(
         date=entry_date,
         name=name,
         code=code,
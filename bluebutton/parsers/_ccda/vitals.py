@@ -12,6 +12,11 @@ from ...core import wrappers
 from ... import documents
 
 
+Vital = wrappers.record('Vital', ['date', 'results'])
+VitalResult = wrappers.record('VitalResult', [
+    'name', 'code', 'code_system', 'code_system_name', 'value', 'unit'])
+
+
 def vitals(ccda):
 
     parse_date = documents.parse_date
@@ -39,7 +44,7 @@ def vitals(ccda):
             value = wrappers.parse_number(el.attr('value'))
             unit = el.attr('unit')
 
-            results_data.append(wrappers.ObjectWrapper(
+            results_data.append(VitalResult(
                 name=name,
                 code=code,
                 code_system=code_system,
@@ -48,7 +53,7 @@ def vitals(ccda):
                 unit=unit
             ))
 
-        data.append(wrappers.ObjectWrapper(
+        data.append(Vital(
             date=entry_date,
             results=results_data
         ))
@@ -4,6 +4,9 @@
 # Use of this source code is governed by the license found in the LICENSE file.
 ###############################################################################
 
+from collections import OrderedDict
+import functools
+
 from ._ccda.allergies import allergies
 from ._ccda.care_plan import care_plan
 from ._ccda.demographics import demographics
@@ -19,27 +22,196 @@ from ._ccda.procedures import procedures
 from ._ccda.results import results
 from ._ccda.smoking_status import smoking_status
 from ._ccda.vitals import vitals
+from ._ccda import schema
+from .. import documents
 from ..core import wrappers
+from ..core import xml
+
+
+# Fields of the parsed document => (section name, parser), in output order
+FIELDS = OrderedDict([
+    ('document', ('document', document)),
+    ('allergies', ('allergies', allergies)),
+    ('care_plan', ('care_plan', care_plan)),
+    ('chief_complaint', ('chief_complaint',
+                         lambda ccda: free_text(ccda, 'chief_complaint'))),
+    ('demographics', ('demographics', demographics)),
+    ('encounters', ('encounters', encounters)),
+    ('functional_statuses', ('functional_statuses', functional_statuses)),
+    ('immunizations', ('immunizations',
+                       lambda ccda: immunizations(ccda).administered)),
+    ('immunization_declines', ('immunizations',
+                               lambda ccda: immunizations(ccda).declined)),
+    ('instructions', ('instructions', instructions)),
+    ('results', ('results', results)),
+    ('medications', ('medications', medications)),
+    ('problems', ('problems', problems)),
+    ('procedures', ('procedures', procedures)),
+    ('smoking_status', ('social_history', smoking_status)),
+    ('vitals', ('vitals', vitals)),
+])
+
+
+def select(sections=None):
+    """
+    Returns the FIELDS named in `sections` (all of them if it's None), in
+    output order
+    """
+    if sections is None:
+        return FIELDS
+
+    unknown = set(sections) - set(FIELDS)
+    if unknown:
+        raise ValueError('Unknown sections: %s (expected some of: %s)'
+                         % (', '.join(sorted(unknown)), ', '.join(FIELDS)))
+    return OrderedDict((field, FIELDS[field]) for field in FIELDS
+                       if field in sections)
+
+
+def run(ccda, sections=None):
+    """
+    Returns the parsed document, with each field parsed from `ccda` the first
+    time it is accessed. Call evaluate() on the result to parse them all.
+
+    If `sections` is given, only those fields are on the result.
+    """
+    return wrappers.LazyObjectWrapper(OrderedDict(
+        (field, functools.partial(parser, ccda))
+        for field, (_, parser) in select(sections).items()))
+
+
+def load(fields):
+    """
+    Returns a result like run()'s holding already parsed values, from a
+    sequence of (field, value) pairs in output order
+    """
+    return wrappers.LazyObjectWrapper(OrderedDict(
+        (field, functools.partial(_same, value)) for field, value in fields))
+
+
+def digests(ccda, sections=None):
+    """
+    Returns the hash of the section that each field in `sections` (all of
+    them if it's None) is parsed from, or None for a section `ccda` doesn't
+    have. The header fields' "section" is the header: the root element
+    without its <component>.
+    """
+    by_name = {}
+    for name, _ in select(sections).values():
+        if name not in by_name:
+            section = ccda.section(name)
+            by_name[name] = section.digest(
+                ('component',) if name in documents.ccda.HEADER_SECTIONS
+                else ())
+    return OrderedDict((field, by_name[name])
+                       for field, (name, _) in select(sections).items())
+
+
+def run_incremental(ccda, previous, previous_digests, sections=None):
+    """
+    Like run(), but fields whose sections hash the same as they did in the
+    document of `previous` (an earlier result, with `previous_digests` as
+    digests() returned them for its document) are taken from it rather than
+    parsed again: they're the same objects.
+
+    Returns the result and the digests of `ccda`, to pass along to the next
+    update. As with run_stream(), a narrative <reference> is assumed to be
+    resolved within its own section.
+    """
+    current = digests(ccda, sections)
+    loaders = OrderedDict()
+    for field, (_, parser) in select(sections).items():
+        if field in previous_digests and \
+                previous_digests[field] == current[field] and \
+                _has_field(previous, field):
+            # the value rather than `previous`, which would keep every
+            # earlier result alive
+            loaders[field] = functools.partial(_same,
+                                               getattr(previous, field))
+        else:
+            loaders[field] = functools.partial(parser, ccda)
+    return wrappers.LazyObjectWrapper(loaders), current
+
+
+def _has_field(data, field):
+    # without parsing it, if `data` is lazy
+    if isinstance(data, wrappers.LazyObjectWrapper) and \
+            data._loaders is not None:
+        return field in data._loaders
+    return hasattr(data, field)
+
+
+def run_json(data):
+    """
+    Returns a result like run()'s from the JSON that data.json() wrote for
+    one (as json.loads returns it), with its records, lists and dates
+    restored, so that its json() is the same again. Each field is loaded
+    the first time it is accessed.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Not BlueButton JSON: expected an object, got %s'
+                         % type(data).__name__)
+    unknown = set(data) - set(FIELDS)
+    if unknown:
+        raise ValueError('Not BlueButton JSON: unknown fields %s'
+                         % ', '.join(sorted(unknown)))
+
+    return wrappers.LazyObjectWrapper(OrderedDict(
+        (field, functools.partial(schema.load, field, data[field]))
+        for field in select(data)))
+
+
+def _same(value):
+    return value
+
+
+def run_stream(source, backend=None, sections=None):
+    """
+    Parses a CCDA one outermost <section> at a time, clearing each section
+    once its parsers have run, so the whole document is never held in
+    memory. `source` is an XML string or a file-like object.
+
+    The result is the same as run()'s, except that a narrative <reference>
+    can only be resolved within its own section (which is where C-CDA puts
+    them). The header fields are parsed last, from the root element left
+    once every section has been cleared.
+
+    If `sections` is given, only those fields are parsed, and sections that
+    none of them need are skipped without being indexed.
+    """
+    backend = xml.get_backend(backend)
+    fields = select(sections)
+    body_fields = OrderedDict(
+        (field, (name, parser)) for field, (name, parser) in fields.items()
+        if name not in documents.ccda.HEADER_SECTIONS)
+    template_ids = set(template_id for name, _ in body_fields.values()
+                       for template_id in documents.ccda.SECTIONS[name])
+    # field => (rank of the templateId its section was found by, value)
+    found = {}
+
+    for root, section in xml.iter_sections(source, backend):
+        if section is None:
+            break
+
+        if not any(el.get('root') in template_ids for el in
+                   section.iter(xml.NAMESPACE + 'templateId')):
+            continue
+
+        ccda = documents.ccda.process(xml._Element.wrap_root(section, backend))
+        for field, (name, parser) in body_fields.items():
+            rank = documents.ccda.section_rank(ccda, name)
+            if rank is not None and (field not in found or
+                                     rank < found[field][0]):
+                found[field] = (rank, parser(ccda))
 
+    header = xml._Element.wrap_root(root, backend)
+    if 'ccda' != documents.detect(header):
+        raise ValueError('Only CCDA documents can be parsed as a stream')
 
-def run(ccda):
+    ccda = documents.ccda.process(header)
     data = wrappers.ObjectWrapper()
+    for field, (_, parser) in fields.items():
+        setattr(data, field, found[field][1] if field in found
+                else parser(ccda))
 
-    data.document = document(ccda)
-    data.allergies = allergies(ccda)
-    data.care_plan = care_plan(ccda)
-    data.chief_complaint = free_text(ccda, 'chief_complaint')
-    data.demographics = demographics(ccda)
-    data.encounters = encounters(ccda)
-    data.functional_statuses = functional_statuses(ccda)
-    data.immunizations = immunizations(ccda).administered
-    data.immunization_declines = immunizations(ccda).declined
-    data.instructions = instructions(ccda)
-    data.results = results(ccda)
-    data.medications = medications(ccda)
-    data.problems = problems(ccda)
-    data.procedures = procedures(ccda)
-    data.smoking_status = smoking_status(ccda)
-    data.vitals = vitals(ccda)
-
-    return data
\ No newline at end of file
+    return data
@@ -6,6 +6,7 @@ import setuptools
 
 setuptools.setup(
     name='bluebutton',
+    # keep in step with bluebutton.__version__
     version='0.4.2.post0',
     packages=setuptools.find_packages(),
     description='The Blue Button Python Library',
@@ -26,6 +27,15 @@ setuptools.setup(
         "phr",
         "record"
     ],
+    entry_points={
+        'console_scripts': [
+            'bluebutton-convert = bluebutton.cli:main',
+        ],
+    },
+    extras_require={
+        'lxml': ['lxml'],
+        'numpy': ['numpy'],
+    },
     setup_requires=[
         "nose >= 1.0",
         "nosexcover >= 1.0.10",
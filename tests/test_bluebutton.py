@@ -0,0 +1,334 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import gc
+import io
+import json
+import os
+import unittest
+import weakref
+
+import bluebutton
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'ccda.xml')
+
+
+def read_fixture():
+    with open(FIXTURE) as fp:
+        return fp.read()
+
+
+class TestStream(unittest.TestCase):
+
+    def setUp(self):
+        self.source = read_fixture()
+        self.expected = bluebutton.BlueButton(self.source).data.json()
+
+    def test_stream_matches_full_parse(self):
+        bb = bluebutton.BlueButton(self.source, {'stream': True})
+        self.assertEqual(bb.type, 'ccda')
+        self.assertIsNone(bb.source)
+        self.assertEqual(bb.data.json(), self.expected)
+
+    def test_stream_file_object(self):
+        bb = bluebutton.BlueButton(io.BytesIO(self.source), {'stream': True})
+        self.assertEqual(bb.data.json(), self.expected)
+
+    def test_stream_etree_backend(self):
+        bb = bluebutton.BlueButton(self.source, {'stream': True,
+                                                 'backend': 'etree'})
+        self.assertEqual(bb.data.json(), self.expected)
+
+    def test_stream_rejects_non_ccda(self):
+        source = self.source.replace('2.16.840.1.113883.10.20.22.1.1', '1.2.3')
+        self.assertRaises(ValueError, bluebutton.BlueButton, source,
+                          {'stream': True})
+
+
+class TestLazy(unittest.TestCase):
+
+    def setUp(self):
+        self.bb = bluebutton.BlueButton(read_fixture())
+
+    def test_sections_parsed_on_access(self):
+        self.assertEqual(vars(self.bb.data), {})
+        self.assertEqual(len(self.bb.data.medications), 2)
+        self.assertEqual(list(vars(self.bb.data)), ['medications'])
+        self.assertIs(self.bb.data.medications, self.bb.data.medications)
+
+    def test_unknown_attribute(self):
+        self.assertRaises(AttributeError, getattr, self.bb.data, 'nope')
+
+    def test_evaluate(self):
+        data = self.bb.data.evaluate()
+        self.assertEqual(len(vars(data)), 16)
+
+    def test_json_after_partial_access(self):
+        expected = bluebutton.BlueButton(read_fixture()).data.json()
+        self.bb.data.vitals
+        self.bb.data.demographics
+        self.assertEqual(self.bb.data.json(), expected)
+        self.assertEqual(json.loads(expected)['vitals'][0]['results'][1]['value'],
+                         86.5)
+
+
+class TestSections(unittest.TestCase):
+
+    def setUp(self):
+        self.source = read_fixture()
+        self.full = json.loads(bluebutton.BlueButton(self.source).data.json())
+
+    def test_selected_sections_only(self):
+        for stream in (False, True):
+            bb = bluebutton.BlueButton(self.source, {
+                'sections': ['problems', 'allergies', 'demographics'],
+                'stream': stream})
+            data = json.loads(bb.data.json())
+            self.assertEqual(sorted(data),
+                             ['allergies', 'demographics', 'problems'])
+            for field in data:
+                self.assertEqual(data[field], self.full[field])
+            self.assertRaises(AttributeError, getattr, bb.data, 'results')
+
+    def test_unknown_section(self):
+        self.assertRaises(ValueError, bluebutton.BlueButton, self.source,
+                          {'sections': ['problems', 'labs']})
+
+
+class TestParseMany(unittest.TestCase):
+
+    def setUp(self):
+        self.source = read_fixture()
+        self.expected = json.loads(bluebutton.BlueButton(self.source).data.json())
+        self.sources = [FIXTURE, self.source, FIXTURE + '.missing', FIXTURE]
+
+    def check(self, results):
+        self.assertEqual([r.index for r in results], [0, 1, 2, 3])
+        self.assertEqual([r.path for r in results],
+                         [FIXTURE, None, FIXTURE + '.missing', FIXTURE])
+        for i in (0, 1, 3):
+            self.assertEqual(results[i].type, 'ccda')
+            self.assertEqual(results[i].data, self.expected)
+            self.assertIsNone(results[i].error)
+        self.assertIsNone(results[2].data)
+        self.assertTrue(results[2].error.startswith('IOError'))
+
+    def test_in_process(self):
+        self.check(list(bluebutton.parse_many(iter(self.sources), workers=1)))
+
+    def test_pool_ordered(self):
+        self.check(list(bluebutton.parse_many(self.sources, workers=2)))
+
+    def test_pool_unordered(self):
+        results = bluebutton.parse_many(self.sources, workers=2, chunksize=2,
+                                        ordered=False)
+        self.check(sorted(results, key=lambda r: r.index))
+
+    def test_reads_sources_as_needed(self):
+        taken = []
+
+        def sources():
+            for i in range(50):
+                taken.append(i)
+                yield FIXTURE
+
+        for ordered in (True, False):
+            del taken[:]
+            results = bluebutton.parse_many(sources(), workers=2,
+                                            ordered=ordered)
+            next(results)
+            # two chunks per worker, and the one topping them up
+            self.assertTrue(len(taken) <= 5, taken)
+            self.assertEqual(len(list(results)), 49)
+
+
+class TestDump(unittest.TestCase):
+
+    def setUp(self):
+        self.source = read_fixture()
+        self.expected = bluebutton.BlueButton(self.source).data.json()
+
+    def test_json(self):
+        fp = io.BytesIO()
+        bluebutton.BlueButton(self.source).dump(fp)
+        self.assertEqual(fp.getvalue(), self.expected)
+
+    def test_json_after_partial_access(self):
+        bb = bluebutton.BlueButton(self.source)
+        bb.data.vitals
+        fp = io.BytesIO()
+        bb.dump(fp)
+        self.assertEqual(fp.getvalue(), self.expected)
+
+    def test_json_stream(self):
+        fp = io.BytesIO()
+        bluebutton.BlueButton(self.source, {'stream': True}).dump(fp)
+        self.assertEqual(fp.getvalue(), self.expected)
+
+    def test_ndjson(self):
+        fp = io.BytesIO()
+        bluebutton.BlueButton(self.source).dump(fp, 'ndjson', 'doc-1')
+        lines = [json.loads(line) for line in fp.getvalue().splitlines()]
+        expected = json.loads(self.expected)
+
+        self.assertTrue(all(line['document'] == 'doc-1' for line in lines))
+        for section, value in expected.items():
+            entries = [line['entry'] for line in lines
+                       if line['section'] == section]
+            if isinstance(value, list):
+                self.assertEqual(entries, value)
+            else:
+                self.assertEqual(entries, [value])
+
+    def test_unknown_format(self):
+        bb = bluebutton.BlueButton(self.source)
+        self.assertRaises(ValueError, bb.dump, io.BytesIO(), 'xml')
+
+
+class TestIncremental(unittest.TestCase):
+
+    def setUp(self):
+        self.source = read_fixture()
+        self.previous = bluebutton.BlueButton(self.source)
+        # a new height in the vitals
+        self.updated = self.source.replace('value="177" unit="cm"',
+                                           'value="178" unit="cm"')
+
+    def test_matches_full_parse(self):
+        bb = bluebutton.BlueButton(self.updated, {'previous': self.previous})
+        self.assertEqual(bb.data.json(),
+                         bluebutton.BlueButton(self.updated).data.json())
+        self.assertEqual(bb.data.vitals[0].results[0].value, 178)
+
+    def test_reuses_unchanged_sections(self):
+        bb = bluebutton.BlueButton(self.updated, {'previous': self.previous})
+        for field in bluebutton.parsers.ccda.FIELDS:
+            reused = getattr(bb.data, field) is \
+                getattr(self.previous.data, field)
+            self.assertEqual(reused, field != 'vitals', field)
+
+    def test_header_change(self):
+        updated = self.source.replace('<title>', '<title>New ', 1)
+        bb = bluebutton.BlueButton(updated, {'previous': self.previous})
+        self.assertIsNot(bb.data.document, self.previous.data.document)
+        self.assertIs(bb.data.vitals, self.previous.data.vitals)
+        self.assertEqual(bb.data.json(),
+                         bluebutton.BlueButton(updated).data.json())
+
+    def test_chained(self):
+        bb = bluebutton.BlueButton(self.updated, {'previous': self.previous})
+        again = bluebutton.BlueButton(self.updated, {'previous': bb})
+        self.assertIs(again.data.vitals, bb.data.vitals)
+
+    def test_earlier_results_freed(self):
+        first = weakref.ref(self.previous.data)
+        bb = self.previous
+        for value in ('178', '179', '180'):
+            source = self.source.replace('value="177" unit="cm"',
+                                         'value="%s" unit="cm"' % value)
+            bb = bluebutton.BlueButton(source, {'previous': bb})
+        del self.previous
+        gc.collect()
+        self.assertIsNone(first())
+        self.assertEqual(bb.data.vitals[0].results[0].value, 180)
+        self.assertEqual(bb.data.json(),
+                         bluebutton.BlueButton(source).data.json())
+
+    def test_sections(self):
+        options = {'previous': self.previous, 'sections': ['vitals']}
+        bb = bluebutton.BlueButton(self.source, options)
+        self.assertIs(bb.data.vitals, self.previous.data.vitals)
+        self.assertRaises(AttributeError, getattr, bb.data, 'results')
+
+
+class TestJSON(unittest.TestCase):
+
+    def setUp(self):
+        self.parsed = bluebutton.BlueButton(read_fixture()).data
+        self.expected = self.parsed.json()
+
+    def test_round_trip(self):
+        bb = bluebutton.BlueButton(self.expected)
+        self.assertEqual(bb.type, 'json')
+        self.assertEqual(bb.data.json(), self.expected)
+        self.assertEqual(bb.data.evaluate().json(), self.expected)
+
+    def test_restores_values(self):
+        data = bluebutton.BlueButton(self.expected).data
+        self.assertIsInstance(data.document.date, datetime.datetime)
+        self.assertEqual(data.document.date, self.parsed.document.date)
+        self.assertIsInstance(data.demographics.dob, datetime.date)
+        self.assertEqual(data.demographics.dob, self.parsed.demographics.dob)
+        self.assertIsInstance(data.vitals, bluebutton.wrappers.ListWrapper)
+        self.assertEqual(data.vitals[0].results[0],
+                         self.parsed.vitals[0].results[0])
+        self.assertEqual(data.allergies[0].date_range,
+                         self.parsed.allergies[0].date_range)
+
+    def test_sections(self):
+        expected = bluebutton.BlueButton(
+            read_fixture(), {'sections': ['vitals']}).data.json()
+        data = bluebutton.BlueButton(expected).data
+        self.assertEqual(data.json(), expected)
+        self.assertRaises(AttributeError, getattr, data, 'results')
+
+    def test_not_a_parsed_document(self):
+        with self.assertRaises(ValueError) as raised:
+            bluebutton.BlueButton('{"x": 1}')
+        self.assertEqual(str(raised.exception),
+                         'Not BlueButton JSON: unknown fields x')
+        bb = bluebutton.BlueButton('{"vitals": [{"when": 1}]}')
+        self.assertRaises(ValueError, getattr, bb.data, 'vitals')
+
+    def test_malformed_xml(self):
+        bb = bluebutton.BlueButton(
+            '<?xml version="1.0"?><ClinicalDocument><broken')
+        self.assertIsNone(bb.data)
+        self.assertIsNone(bluebutton.BlueButton('[1, 2]').data)
+
+
+@unittest.skipIf(bluebutton.columnar.numpy is None, 'numpy is not installed')
+class TestColumns(unittest.TestCase):
+
+    def setUp(self):
+        self.bb = bluebutton.BlueButton(read_fixture())
+
+    def test_results(self):
+        numpy = bluebutton.columnar.numpy
+        columns = self.bb.columns('results')
+        tests = [test for panel in self.bb.data.results
+                 for test in panel.tests]
+        self.assertEqual(len(columns), len(tests))
+        for row, test in zip(columns, tests):
+            self.assertEqual(row['code'], test.code)
+            self.assertEqual(row['unit'], test.unit)
+            if isinstance(test.value, (int, float)):
+                self.assertEqual(row['value'], test.value)
+            else:
+                self.assertTrue(numpy.isnan(row['value']))
+            self.assertEqual(row['reference_range_low'],
+                             float(test.reference_range.low_value))
+
+    def test_vitals(self):
+        columns = self.bb.columns('vitals')
+        vital = self.bb.data.vitals[0]
+        self.assertEqual(columns['date'][0].astype(datetime.datetime),
+                         datetime.datetime.combine(vital.date,
+                                                   datetime.time()))
+        self.assertEqual(columns['value'][0], vital.results[0].value)
+        self.assertTrue(bluebutton.columnar.numpy.isnan(
+            columns['reference_range_high']).all())
+
+    def test_concatenate(self):
+        numpy = bluebutton.columnar.numpy
+        columns = self.bb.columns('vitals')
+        joined = numpy.concatenate([columns, columns[:0], columns])
+        self.assertEqual(joined.dtype, columns.dtype)
+        self.assertEqual(len(joined), 2 * len(columns))
+
+    def test_unknown_section(self):
+        self.assertRaises(ValueError, self.bb.columns, 'allergies')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import bluebutton
+from bluebutton import cache
+from bluebutton.core import wrappers
+from bluebutton.core import xml
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'ccda.xml')
+
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.cache = cache.DiskCache(self.tmp, max_bytes=10000)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_put_get(self):
+        self.assertIsNone(self.cache.get('ab' * 32))
+        self.cache.put('ab' * 32, '{"a": [1, 2]}')
+        self.assertEqual(self.cache.get('ab' * 32), {'a': [1, 2]})
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_corrupt_entry_is_a_miss(self):
+        self.cache.put('ab' * 32, '"value"')
+        with open(self.cache._path('ab' * 32), 'wb') as fp:
+            fp.write('{"cut short": ')
+        self.assertIsNone(self.cache.get('ab' * 32))
+        self.assertFalse(os.path.exists(self.cache._path('ab' * 32)))
+
+    def test_evicts_least_recently_used(self):
+        value = 'x' * 2500
+        for i in range(3):
+            self.cache.put('%02d' % i * 32, '"%s"' % value)
+            os.utime(self.cache._path('%02d' % i * 32),
+                     (time.time() - 100 + i, time.time() - 100 + i))
+        # used, so no longer the oldest
+        self.cache.get('00' * 32)
+        self.cache.put('03' * 32, '"%s"' % value)
+
+        self.assertIsNone(self.cache.get('01' * 32))
+        for i in (0, 2, 3):
+            self.assertEqual(self.cache.get('%02d' % i * 32), value)
+        self.assertTrue(self.cache._scan_size() <= 10000)
+
+    def test_key(self):
+        source = '<ClinicalDocument/>'
+        self.assertEqual(cache.key(source, '1'), cache.key(source, '1'))
+        self.assertNotEqual(cache.key(source, '1'), cache.key(source, '2'))
+        self.assertNotEqual(cache.key(source, '1'),
+                            cache.key(source, '1', ['vitals']))
+        self.assertEqual(cache.key(source, '1', ['vitals', 'results']),
+                         cache.key(source, '1', ['results', 'vitals']))
+
+
+class TestMemoryCache(unittest.TestCase):
+
+    def test_put_get(self):
+        memory_cache = cache.MemoryCache()
+        self.assertIsNone(memory_cache.get('a'))
+        memory_cache.put('a', [1, 2])
+        self.assertEqual(memory_cache.get('a'), (1, 2))
+        self.assertIs(memory_cache.get('a'), memory_cache.get('a'))
+        self.assertEqual(memory_cache.stats(), {
+            'entries': 1, 'bytes': memory_cache.size, 'hits': 3,
+            'misses': 1, 'evictions': 0})
+
+    def test_evicts_least_recently_used(self):
+        memory_cache = cache.MemoryCache(max_entries=2)
+        memory_cache.put('a', 'a')
+        memory_cache.put('b', 'b')
+        memory_cache.get('a')
+        memory_cache.put('c', 'c')
+        self.assertIsNone(memory_cache.get('b'))
+        self.assertEqual(memory_cache.get('a'), 'a')
+        self.assertEqual(memory_cache.get('c'), 'c')
+        self.assertEqual(memory_cache.evictions, 1)
+
+    def test_evicts_by_size(self):
+        memory_cache = cache.MemoryCache(max_bytes=2500)
+        for i in range(3):
+            memory_cache.put(i, 'x' * 1000)
+        self.assertEqual(len(memory_cache), 2)
+        self.assertIsNone(memory_cache.get(0))
+        self.assertTrue(memory_cache.size <= 2500)
+
+        memory_cache.put(1, 'x')
+        self.assertTrue(memory_cache.size < 1200)
+
+    def test_threads(self):
+        memory_cache = cache.MemoryCache(max_entries=10)
+
+        def use():
+            for i in range(1000):
+                if memory_cache.get(i % 20) is None:
+                    memory_cache.put(i % 20, [i])
+        threads = [threading.Thread(target=use) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = memory_cache.stats()
+        self.assertEqual(stats['hits'] + stats['misses'], 4000)
+        self.assertEqual(stats['entries'], 10)
+
+
+class TestBlueButtonCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        with open(FIXTURE) as fp:
+            self.source = fp.read()
+        self.expected = bluebutton.BlueButton(self.source).data.json()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_hit_skips_parsing(self):
+        bb = bluebutton.BlueButton(self.source, {'cache': self.tmp})
+        self.assertEqual(bb.data.json(), self.expected)
+
+        def fail(*args, **kwargs):
+            raise AssertionError('parsed XML on a cache hit')
+        parse, xml.parse = xml.parse, fail
+        try:
+            bb = bluebutton.BlueButton('\xef\xbb\xbf' + self.source,
+                                       {'cache': self.tmp})
+        finally:
+            xml.parse = parse
+
+        self.assertEqual(bb.type, 'ccda')
+        self.assertIsNone(bb.source)
+        self.assertEqual(bb.data.json(), self.expected)
+        self.assertEqual(bb.data.evaluate().json(), self.expected)
+
+    def test_sections(self):
+        options = {'cache': cache.DiskCache(self.tmp),
+                   'sections': ['vitals']}
+        bluebutton.BlueButton(self.source, options)
+        bb = bluebutton.BlueButton(self.source, options)
+        self.assertEqual(options['cache'].hits, 1)
+        self.assertEqual(bb.data.json(), bluebutton.BlueButton(
+            self.source, {'sections': ['vitals']}).data.json())
+
+        bb = bluebutton.BlueButton(self.source, {'cache': options['cache']})
+        self.assertEqual(options['cache'].hits, 1)
+        self.assertEqual(bb.data.json(), self.expected)
+
+    def test_memory_cache(self):
+        options = {'cache': cache.MemoryCache()}
+        bluebutton.BlueButton(self.source, options)
+        first = bluebutton.BlueButton(self.source, options)
+        second = bluebutton.BlueButton(self.source, options)
+        self.assertEqual(options['cache'].hits, 2)
+        self.assertEqual(first.data.json(), self.expected)
+
+        # shared, so changing one would change the other
+        self.assertIs(first.data.vitals, second.data.vitals)
+        self.assertIsInstance(first.data.vitals, wrappers.FrozenListWrapper)
+        self.assertRaises(TypeError, first.data.vitals.pop)
+        self.assertRaises(AttributeError, setattr, first.data.document,
+                          'title', '')
+
+    def test_stream(self):
+        options = {'cache': self.tmp, 'stream': True}
+        bluebutton.BlueButton(self.source, options)
+        bb = bluebutton.BlueButton(self.source, options)
+        self.assertEqual(bb.data.json(), self.expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+import bluebutton
+from bluebutton import cli
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'ccda.xml')
+
+
+class TestConvert(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.inputs = os.path.join(self.tmp, 'in')
+        os.makedirs(os.path.join(self.inputs, 'sub'))
+        shutil.copy(FIXTURE, os.path.join(self.inputs, 'a.xml'))
+        shutil.copy(FIXTURE, os.path.join(self.inputs, 'sub', 'b.xml'))
+        self.zip = os.path.join(self.tmp, 'docs.zip')
+        with zipfile.ZipFile(self.zip, 'w') as archive:
+            archive.write(FIXTURE, 'c.xml')
+        with open(FIXTURE) as fp:
+            self.expected = bluebutton.BlueButton(fp.read()).data.json()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_json(self):
+        out = os.path.join(self.tmp, 'out')
+        self.assertEqual(cli.main([self.inputs, self.zip, '-o', out,
+                                   '-j', '1']), 0)
+        for name in ('a.json', 'sub/b.json', 'docs/c.json'):
+            with open(os.path.join(out, name)) as fp:
+                self.assertEqual(fp.read(), self.expected)
+
+        os.remove(os.path.join(out, 'a.json'))
+        os.utime(os.path.join(out, 'sub', 'b.json'), (0, 0))
+        cli.main([self.inputs, self.zip, '-o', out, '-j', '1', '--resume'])
+        self.assertTrue(os.path.exists(os.path.join(out, 'a.json')))
+        self.assertEqual(os.stat(os.path.join(out, 'sub', 'b.json')).st_mtime, 0)
+
+    def test_ndjson_resume(self):
+        out = os.path.join(self.tmp, 'out.ndjson')
+        cli.main([os.path.join(self.inputs, 'a.xml'), '-f', 'ndjson',
+                  '-o', out, '-j', '1'])
+        cli.main([self.inputs, self.zip, '-f', 'ndjson', '-o', out,
+                  '-j', '1', '--resume'])
+        with open(out) as fp:
+            lines = [json.loads(line) for line in fp]
+        self.assertEqual(sorted(line['source'] for line in lines),
+                         sorted([os.path.join(self.inputs, 'a.xml'),
+                                 os.path.join(self.inputs, 'sub', 'b.xml'),
+                                 self.zip + '!c.xml']))
+        self.assertEqual(lines[0]['data'], json.loads(self.expected))
+
+    def test_pool(self):
+        out = os.path.join(self.tmp, 'out')
+        self.assertEqual(cli.main([self.inputs, self.zip, '-o', out,
+                                   '-j', '2']), 0)
+        for name in ('a.json', 'sub/b.json', 'docs/c.json'):
+            with open(os.path.join(out, name)) as fp:
+                self.assertEqual(fp.read(), self.expected)
+
+    def test_not_ccda(self):
+        c32 = os.path.join(self.tmp, 'c32.xml')
+        with open(c32, 'w') as fp:
+            fp.write('<ClinicalDocument xmlns="urn:hl7-org:v3"><templateId '
+                     'root="2.16.840.1.113883.3.88.11.32.1"/>'
+                     '</ClinicalDocument>')
+        out = os.path.join(self.tmp, 'out')
+        self.assertEqual(cli.main([c32, os.path.join(self.inputs, 'a.xml'),
+                                   '-o', out, '-j', '1']), 1)
+        self.assertEqual(os.listdir(out), ['a.json'])
+
+        out = os.path.join(self.tmp, 'out.ndjson')
+        self.assertEqual(cli.main([c32, '-f', 'ndjson', '-o', out,
+                                   '-j', '1']), 1)
+        with open(out) as fp:
+            self.assertEqual([json.loads(line) for line in fp], [{
+                'source': c32, 'error': "unsupported document type 'c32'"}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,12 @@
 __author__ = 'glow'
 
 import datetime
+import io
+import os
 import unittest
+from bluebutton import core
+from bluebutton import documents
+from bluebutton.documents import ccda
 from bluebutton.documents import parse_date
 from bluebutton.core.wrappers import FixedOffset
 
@@ -50,3 +55,214 @@ class TestParseDate(unittest.TestCase):
         # python thinks that is insane, I agree with python
         self.assertEqual(None, parse_date('000101'))
 
+    def test_repeated_dates_are_shared(self):
+        first = parse_date('20101028092016.829-0500')
+        self.assertIs(parse_date('20101028092016.829-0500'), first)
+        self.assertIs(parse_date('201312010800-0500').tzinfo, first.tzinfo)
+        self.assertIs(parse_date('201308221815').tzinfo,
+                      parse_date('201308221815Z').tzinfo)
+
+    def test_invalid_date_not_cached(self):
+        self.assertRaises(ValueError, parse_date, 'abcd')
+        self.assertRaises(ValueError, parse_date, 'abcd')
+
+    def test_cache_bounded(self):
+        cache_info = documents._parse_date_string.cache_info
+        for year in range(1800, 1800 + cache_info()[2] + 10):
+            parse_date(str(year))
+        self.assertEqual(cache_info()[3], cache_info()[2])
+        self.assertEqual(parse_date('1800'), datetime.date(1800, 1, 1))
+
+
+def read_fixture():
+    with open(os.path.join(os.path.dirname(__file__), 'fixtures',
+                           'ccda.xml')) as fp:
+        return fp.read()
+
+
+class TestSniff(unittest.TestCase):
+
+    def setUp(self):
+        self.source = read_fixture()
+
+    def test_header(self):
+        header = documents.sniff(self.source)
+        self.assertEqual(header.type, 'ccda')
+        self.assertEqual(header.template_ids, [
+            '2.16.840.1.113883.10.20.22.1.1', '2.16.840.1.113883.10.20.22.1.2'])
+        self.assertEqual(header.effective_time, datetime.datetime(
+            2013, 7, 3, 9, 48, 12, 0, FixedOffset(-300, '-0500')))
+        self.assertEqual(header.patient_ids, [documents.Identifier(
+            root='2.16.840.1.113883.19.5', extension='998991')])
+
+    def test_reads_only_the_header(self):
+        fp = io.BytesIO(self.source)
+        header = documents.sniff(fp, 'etree')
+        self.assertEqual(header, documents.sniff(self.source))
+        self.assertTrue(fp.tell() < len(self.source))
+
+    def test_not_ccda(self):
+        header = documents.sniff('<ClinicalDocument xmlns="urn:hl7-org:v3"/>')
+        self.assertIsNone(header.type)
+        self.assertEqual(header.patient_ids, [])
+        self.assertIsNone(documents.sniff('{"document": {}}'))
+
+
+class TestScan(unittest.TestCase):
+
+    def test_same_as_section(self):
+        source = read_fixture()
+        doc = ccda.process(core.parse_data(source))
+        expected = []
+        for name, template_ids in ccda.SECTIONS.items():
+            rank = ccda.section_rank(doc, name)
+            if rank is None:
+                continue
+            section, entries = doc.section(name), None
+            if hasattr(section, 'entries'):
+                entries = len(section.entries())
+            expected.append(ccda.SectionPresence(
+                name=name, template_id=template_ids[rank], entries=entries))
+
+        self.assertEqual(ccda.scan(source), expected)
+        self.assertEqual(ccda.scan(io.BytesIO(source), 'etree'), expected)
+
+    def test_preferred_template(self):
+        source = """<ClinicalDocument xmlns="urn:hl7-org:v3">
+          <component><structuredBody>
+            <component><section>
+              <templateId root="2.16.840.1.113883.10.20.22.2.4"/>
+              <entry/>
+            </section></component>
+            <component><section>
+              <templateId root="2.16.840.1.113883.10.20.22.2.4.1"/>
+              <entry><organizer><component><entry/></component></organizer>
+              </entry>
+            </section></component>
+          </structuredBody></component>
+        </ClinicalDocument>"""
+        self.assertEqual(ccda.scan(source), [ccda.SectionPresence(
+            name='vitals', template_id='2.16.840.1.113883.10.20.22.2.4.1',
+            entries=2)])
+
+    def test_without_entries(self):
+        source = """<ClinicalDocument xmlns="urn:hl7-org:v3">
+          <component><structuredBody>
+            <component><section>
+              <templateId root="2.16.840.1.113883.10.20.22.2.1"/>
+              <entry/>
+            </section></component>
+            <component><section>
+              <templateId root="1.3.6.1.4.1.19376.1.5.3.1.1.13.2.1"/>
+              <entry/>
+            </section></component>
+          </structuredBody></component>
+        </ClinicalDocument>"""
+        doc = ccda.process(core.parse_data(source))
+        self.assertEqual(
+            [(presence.name, presence.entries)
+             for presence in ccda.scan(source)],
+            [('chief_complaint', None), ('medications', None)])
+        for name in ('chief_complaint', 'medications'):
+            self.assertFalse(hasattr(doc.section(name), 'entries'))
+
+
+class TestCodeSearch(unittest.TestCase):
+
+    SOURCE = """<ClinicalDocument xmlns="urn:hl7-org:v3">
+      <code code="34133-9" codeSystem="2.16.840.1.113883.6.1"/>
+      <component><structuredBody>
+        <component><section>
+          <templateId root="2.16.840.1.113883.10.20.22.2.4.1"/>
+          <code code="8716-3" codeSystem="2.16.840.1.113883.6.1"/>
+          <entry><organizer>
+            <component><observation>
+              <code code="8302-2" codeSystem="2.16.840.1.113883.6.1"/>
+            </observation></component>
+            <entryRelationship><entry/></entryRelationship>
+          </organizer></entry>
+          <entry><observation>
+            <code code="1"><translation code="8302-2"
+              codeSystem="2.16.840.1.113883.6.1"/></code>
+            <value code="8302-2" codeSystem="2.16.840.1.113883.6.96"/>
+          </observation></entry>
+        </section></component>
+      </structuredBody></component>
+    </ClinicalDocument>"""
+
+    def test_matches(self):
+        for backend in ('etree', None):
+            self.assertEqual(list(ccda.iter_code(
+                self.SOURCE, '8302-2', '2.16.840.1.113883.6.1', backend)), [
+                ccda.CodeMatch(section='vitals', entry=0, tag='code'),
+                ccda.CodeMatch(section='vitals', entry=1, tag='translation')])
+        self.assertEqual(len(list(ccda.iter_code(self.SOURCE, '8302-2'))), 3)
+        self.assertEqual(list(ccda.iter_code(self.SOURCE, '34133-9')),
+                         [ccda.CodeMatch(section=None, entry=None,
+                                         tag='code')])
+        self.assertEqual(list(ccda.iter_code(self.SOURCE, '8716-3')),
+                         [ccda.CodeMatch(section='vitals', entry=None,
+                                         tag='code')])
+
+    def test_unicode_code(self):
+        source = self.SOURCE.replace('<code code="34133-9"',
+                                     '<title>Caf\xc3\xa9</title><code')
+        self.assertTrue(ccda.has_code(source, u'8302-2'))
+        self.assertFalse(ccda.has_code(source, u'2345-7'))
+        self.assertTrue(ccda.has_code(source.decode('utf-8'), '8302-2'))
+
+    def test_has_code(self):
+        self.assertTrue(ccda.has_code(io.BytesIO(self.SOURCE), '8302-2',
+                                      '2.16.840.1.113883.6.96'))
+        self.assertFalse(ccda.has_code(self.SOURCE, '8302-2', '2.16'))
+        self.assertFalse(ccda.has_code(self.SOURCE, '12345'))
+
+
+@unittest.skipIf(documents.numpy is None, 'numpy is not installed')
+class TestParseDates(unittest.TestCase):
+
+    def test_same_as_parse_date(self):
+        strings = ['20101028092016.829-0500', '201312010800-0800',
+                   '19630617120000', '198708', '1954', '201308221815Z',
+                   '2012010112', '1799', '000101', '08', '', None,
+                   '20120230', '201213011200', 'abcd',
+                   # an offset of more than a day
+                   '2013+1131218002900']
+        values, precision = documents.parse_dates(strings)
+        for string, value, p in zip(strings, values, precision):
+            try:
+                expected = parse_date(string)
+                if isinstance(expected, datetime.datetime):
+                    expected = expected - expected.utcoffset()
+            except ValueError:
+                expected = None
+            if expected is None:
+                self.assertTrue(documents.numpy.isnat(value), string)
+                self.assertEqual(p, documents.PRECISION_NONE)
+                continue
+            if isinstance(expected, datetime.datetime):
+                expected = expected.replace(tzinfo=None)
+            else:
+                expected = datetime.datetime.combine(expected,
+                                                     datetime.time())
+            self.assertEqual(value.astype(datetime.datetime), expected,
+                             string)
+
+    def test_precision(self):
+        _, precision = documents.parse_dates(
+            ['1954', '198708', '19870801', '201308221815', '19630617120000',
+             '1700'])
+        self.assertEqual(list(precision), [
+            documents.PRECISION_YEAR, documents.PRECISION_MONTH,
+            documents.PRECISION_DAY, documents.PRECISION_MINUTE,
+            documents.PRECISION_SECOND, documents.PRECISION_NONE])
+
+    def test_utc(self):
+        values, _ = documents.parse_dates(['201312010800-0800',
+                                           '201312011600Z'])
+        self.assertEqual(values[0], values[1])
+        self.assertEqual(str(values.dtype), 'datetime64[us]')
+
+    def test_empty(self):
+        values, precision = documents.parse_dates([])
+        self.assertEqual((len(values), len(precision)), (0, 0))
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+import datetime
+import json
+import pickle
+import unittest
+
+from bluebutton.core import wrappers
+from bluebutton.documents import Address, DateRange, Quantity
+from bluebutton.parsers._ccda.medications import Medication
+
+
+class TestRecord(unittest.TestCase):
+
+    def test_fields_default_to_none(self):
+        quantity = Quantity(value='1')
+        self.assertEqual(quantity.value, '1')
+        self.assertIsNone(quantity.unit)
+
+    def test_no_instance_dict(self):
+        quantity = Quantity(value='1', unit='mg')
+        self.assertFalse(hasattr(quantity, '__dict__'))
+        self.assertRaises(AttributeError, setattr, quantity, 'dose', '1')
+
+    def test_unknown_field(self):
+        self.assertRaises(TypeError, Quantity, value='1', dose='1')
+
+    def test_serializes_like_object_wrapper(self):
+        kwargs = dict(street=['1 Main St'], city='Gainesville', state='FL',
+                      zip='32611', country='US')
+        self.assertEqual(Address(**kwargs).json(),
+                         wrappers.ObjectWrapper(**kwargs).json())
+
+    def test_nested(self):
+        medication = json.loads(
+            Medication(dose_quantity=Quantity(value='1')).json())
+        self.assertEqual(medication['dose_quantity'],
+                         {'value': '1', 'unit': None})
+        self.assertEqual(sorted(medication), sorted(Medication._fields))
+
+    def test_pickle(self):
+        quantity = Quantity(value='1', unit='mg')
+        self.assertEqual(pickle.loads(pickle.dumps(quantity, 2)), quantity)
+        self.assertNotEqual(quantity, Quantity(value='2', unit='mg'))
+
+
+class TestEmpty(unittest.TestCase):
+
+    def test_shared(self):
+        self.assertIs(Quantity.of(value=None, unit=None), Quantity.empty())
+        self.assertIsNot(Quantity.of(value='1'), Quantity.empty())
+        self.assertIsNot(Address.empty(), Quantity.empty())
+
+    def test_refuses_changes(self):
+        empty = Quantity.empty()
+        self.assertRaises(AttributeError, setattr, empty, 'value', '1')
+        self.assertRaises(AttributeError, delattr, empty, 'value')
+        self.assertIsNone(empty.value)
+
+    def test_serializes_like_a_new_record(self):
+        self.assertEqual(Quantity.empty(), Quantity())
+        self.assertEqual(Quantity.empty().json(), Quantity().json())
+        self.assertEqual(repr(Quantity.empty()), repr(Quantity()))
+
+    def test_pickle(self):
+        empty = Quantity.empty()
+        self.assertIs(pickle.loads(pickle.dumps(empty)), empty)
+        self.assertIs(pickle.loads(pickle.dumps(empty, 2)), empty)
+
+    def test_unknown_field(self):
+        self.assertRaises(TypeError, Quantity.of, dose=None)
+
+
+class TestFreeze(unittest.TestCase):
+
+    def setUp(self):
+        self.medications = wrappers.ListWrapper([Medication(
+            date_range=DateRange(start=datetime.date(2012, 1, 3)),
+            dose_quantity=Quantity.empty(),
+            text='Take 1 tablet')])
+        self.frozen = wrappers.freeze(self.medications)
+
+    def test_copy(self):
+        self.assertIsInstance(self.frozen, wrappers.FrozenListWrapper)
+        self.assertEqual(self.frozen, self.medications)
+        self.assertEqual(self.frozen.json(), self.medications.json())
+        self.assertIsNot(self.frozen[0], self.medications[0])
+        self.assertIs(self.frozen[0].dose_quantity, Quantity.empty())
+        self.assertIs(wrappers.freeze(self.frozen), self.frozen)
+
+    def test_refuses_changes(self):
+        self.assertRaises(TypeError, self.frozen.append, None)
+        self.assertRaises(TypeError, self.frozen.__setitem__, 0, None)
+        self.assertRaises(AttributeError, setattr, self.frozen[0], 'text', '')
+        self.assertRaises(AttributeError, setattr,
+                          self.frozen[0].date_range, 'end', None)
+        self.assertEqual(wrappers.freeze(Address(street=['1 Main St'])).street,
+                         ('1 Main St',))
+        self.assertRaises(TypeError, wrappers.freeze, {'a': 1})
+
+    def test_pickle(self):
+        for protocol in (0, 2):
+            frozen = pickle.loads(pickle.dumps(self.frozen, protocol))
+            self.assertIsInstance(frozen, wrappers.FrozenListWrapper)
+            self.assertEqual(frozen, self.medications)
+            self.assertRaises(AttributeError, setattr, frozen[0], 'text', '')
+
+
+class TestDumps(unittest.TestCase):
+
+    def setUp(self):
+        self.data = wrappers.ObjectWrapper(
+            medications=wrappers.ListWrapper([
+                Medication(
+                    date_range=DateRange(start=datetime.date(2012, 1, 3)),
+                    dose_quantity=Quantity(value=1.5, unit=u'\xb5g'),
+                    text='Take "1" tablet\n'),
+                Medication(dose_quantity=Quantity.empty())]),
+            date=datetime.datetime(2013, 12, 1, 8, 0, 0, 0,
+                                   wrappers.FixedOffset(-480, '-0800')),
+            numbers=(1, 2L, float('nan'), -0.1, True, None),
+            mapping={'b': [], 'a': {}, 1: 'one'},
+            lazy=wrappers.LazyObjectWrapper({'x': lambda: 'y'}))
+
+    def test_same_as_encoder(self):
+        expected = json.dumps(self.data, cls=wrappers.JSONEncoder)
+        self.assertEqual(wrappers.dumps(self.data), expected)
+        self.assertEqual(self.data.json(), expected)
+        self.assertEqual(json.dumps(wrappers.to_dict(self.data)), expected)
+
+    def test_unknown_type(self):
+        self.assertRaises(TypeError, wrappers.dumps, [object()])
+        self.assertRaises(TypeError, wrappers.to_dict, [object()])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import unittest
+from bluebutton.core import interning
+from bluebutton.core import xml
+
+SAMPLE = """<?xml version="1.0"?>
+<ClinicalDocument xmlns="urn:hl7-org:v3">
+  <templateId root="2.16.840.1.113883.10.20.22.1.1"/>
+  <component><structuredBody>
+    <component><section>
+      <templateId root="2.16.840.1.113883.10.20.22.2.6.1"/>
+      <text>
+        <table><tr ID="dup"><td ID="dup">cell</td></tr></table>
+        <paragraph ID="para">Hives</paragraph>
+        <content ID="dup">content</content>
+      </text>
+      <entry><act>
+        <templateId root="2.16.840.1.113883.10.20.22.4.30"/>
+        <entryRelationship><observation>
+          <templateId root="2.16.840.1.113883.10.20.22.4.7"/>
+          <value code="416098002"/>
+          <text><reference value="#para"/></text>
+        </observation></entryRelationship>
+      </act></entry>
+      <entry><act>
+        <templateId root="2.16.840.1.113883.10.20.22.4.30"/>
+        <templateId root="2.16.840.1.113883.10.20.22.4.7" extension="2014-06-09"/>
+        <value code="1"/>
+      </act></entry>
+    </section></component>
+  </structuredBody></component>
+</ClinicalDocument>
+"""
+
+
+class ElementTestCase(unittest.TestCase):
+
+    backend = 'etree'
+
+    def setUp(self):
+        self.doc = xml.parse(SAMPLE, self.backend)
+
+
+class TestTemplate(ElementTestCase):
+
+    def test_template_returns_parent(self):
+        el = self.doc.template('2.16.840.1.113883.10.20.22.2.6.1')
+        self.assertTrue(el._element.tag.endswith('section'))
+
+    def test_template_missing(self):
+        self.assertTrue(self.doc.template('1.2.3').is_empty())
+
+    def test_template_scoped_to_entry(self):
+        entries = self.doc.els_by_tag('entry')
+        self.assertEqual(
+            entries[0].template('2.16.840.1.113883.10.20.22.4.7').tag('value').attr('code'),
+            '416098002')
+        self.assertTrue(entries[0].tag('value').template(
+            '2.16.840.1.113883.10.20.22.4.30').is_empty())
+
+    def test_template_first_in_document_order(self):
+        el = self.doc.template('2.16.840.1.113883.10.20.22.4.7')
+        self.assertEqual(el.tag('value').attr('code'), '416098002')
+
+    def test_template_extension(self):
+        el = self.doc.template('2.16.840.1.113883.10.20.22.4.7', '2014-06-09')
+        self.assertEqual(el.tag('value').attr('code'), '1')
+        self.assertTrue(self.doc.template(
+            '2.16.840.1.113883.10.20.22.4.7', '2015-08-01').is_empty())
+
+    def test_template_does_not_mutate_tree(self):
+        el = self.doc.template('2.16.840.1.113883.10.20.22.4.7')
+        self.assertFalse(hasattr(el._element[0], 'parent'))
+
+    def test_index_is_shared(self):
+        entry = self.doc.els_by_tag('entry')[0]
+        self.assertIs(entry._index, self.doc._index)
+        self.assertIs(entry.tag('value')._index, self.doc._index)
+
+
+class TestContent(ElementTestCase):
+
+    def test_content_by_id(self):
+        self.assertEqual(self.doc.content('para').val(), 'Hives')
+
+    def test_content_tag_priority(self):
+        # <content> wins over <td> and <tr> with the same ID
+        self.assertEqual(self.doc.content('dup').val(), 'content')
+
+    def test_content_missing(self):
+        self.assertTrue(self.doc.content('nope').is_empty())
+
+    def test_val_follows_reference(self):
+        entry = self.doc.els_by_tag('entry')[0]
+        self.assertEqual(entry.tag('text').val(), 'Hives')
+
+
+class TestTag(ElementTestCase):
+
+    def test_tag_first_descendant(self):
+        entry = self.doc.els_by_tag('entry')[1]
+        self.assertEqual(entry.tag('value').attr('code'), '1')
+        self.assertEqual(self.doc.tag('value').attr('code'), '416098002')
+
+    def test_tag_excludes_self(self):
+        entry = self.doc.els_by_tag('entry')[0]
+        self.assertTrue(entry.tag('entry').is_empty())
+        self.assertTrue(entry.tag('value').tag('value').is_empty())
+
+    def test_els_by_tag_scoped(self):
+        self.assertEqual(len(self.doc.els_by_tag('templateId')), 6)
+        entry = self.doc.els_by_tag('entry')[1]
+        self.assertEqual(
+            [e.attr('root') for e in entry.els_by_tag('templateId')],
+            ['2.16.840.1.113883.10.20.22.4.30',
+             '2.16.840.1.113883.10.20.22.4.7'])
+
+    def test_empty_element(self):
+        el = self.doc.tag('nope')
+        self.assertTrue(el.tag('value').is_empty())
+        self.assertEqual(el.els_by_tag('value'), [])
+
+
+@unittest.skipIf(xml.lxml_etree is None, 'lxml is not installed')
+class TestTemplateLxml(TestTemplate):
+    backend = 'lxml'
+
+
+@unittest.skipIf(xml.lxml_etree is None, 'lxml is not installed')
+class TestContentLxml(TestContent):
+    backend = 'lxml'
+
+
+@unittest.skipIf(xml.lxml_etree is None, 'lxml is not installed')
+class TestTagLxml(TestTag):
+    backend = 'lxml'
+
+
+class TestBackend(unittest.TestCase):
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, xml.parse, SAMPLE, 'sax')
+
+    def test_default_backend(self):
+        self.assertEqual(xml.get_backend().name, 'etree')
+
+    @unittest.skipIf(xml.lxml_etree is None, 'lxml is not installed')
+    def test_lxml_limits(self):
+        deep = '<a>' * 300 + '</a>' * 300
+        self.assertIsNone(xml.parse(deep, 'lxml'))
+        self.assertIsNotNone(xml.parse(deep, xml.LxmlBackend(huge_tree=True)))
+
+    @unittest.skipIf(xml.lxml_etree is None, 'lxml is not installed')
+    def test_lxml_drops_comments(self):
+        doc = xml.parse(SAMPLE.replace('<entry>', '<entry><!-- c -->'), 'lxml')
+        self.assertEqual(doc.els_by_tag('entry')[0]._element[0].tag,
+                         '{urn:hl7-org:v3}act')
+
+
+class TestIterSections(unittest.TestCase):
+
+    def test_sections_are_released(self):
+        events = list(xml.iter_sections(SAMPLE, 'etree'))
+        self.assertEqual([s is None for _, s in events], [False, True])
+        root = events[-1][0]
+        self.assertEqual(len(root.findall('.//{urn:hl7-org:v3}section')), 0)
+        self.assertEqual(len(root.findall('{urn:hl7-org:v3}templateId')), 1)
+
+
+class TestParseHeader(unittest.TestCase):
+
+    def test_stops_at_body(self):
+        backends = ['etree'] if xml.lxml_etree is None else ['etree', 'lxml']
+        for backend in backends:
+            header = xml.parse_header(SAMPLE + '<junk', backend)
+            self.assertEqual([el.tag for el in header._element],
+                             ['{urn:hl7-org:v3}templateId'])
+            self.assertFalse(header.template(
+                '2.16.840.1.113883.10.20.22.1.1').is_empty())
+
+    def test_malformed(self):
+        self.assertRaises(SyntaxError, xml.parse_header, '<a><b></a>')
+
+
+class TestInterning(unittest.TestCase):
+
+    def tearDown(self):
+        interning.disable()
+
+    def codes(self):
+        doc = xml.parse(SAMPLE, 'etree')
+        return [doc.els_by_tag('value')[0].attr('code') for _ in range(2)]
+
+    def test_disabled(self):
+        self.assertEqual(*self.codes())
+        self.assertIsNone(interning.get_pool())
+
+    def test_shared_across_documents(self):
+        pool = interning.enable()
+        first, second = self.codes()
+        self.assertIs(first, second)
+        self.assertIs(self.codes()[0], first)
+        stats = pool.stats()
+        self.assertEqual(stats['values'], 1)
+        self.assertEqual((stats['hits'], stats['misses']), (3, 1))
+        self.assertTrue(stats['bytes_saved'] > 0)
+
+    def test_other_attributes_not_pooled(self):
+        pool = interning.enable()
+        xml.parse(SAMPLE, 'etree').template(
+            '2.16.840.1.113883.10.20.22.2.6.1').tag('templateId').attr('root')
+        self.assertEqual(len(pool), 0)
+
+    def test_max_size(self):
+        pool = interning.enable(max_size=1)
+        self.assertEqual(pool.intern('a'), 'a')
+        self.assertEqual(pool.intern('b'), 'b')
+        self.assertEqual(len(pool), 1)
+
+    def test_threads(self):
+        pool = interning.enable()
+
+        def intern():
+            for i in range(1000):
+                pool.intern(str(i % 10))
+        threads = [threading.Thread(target=intern) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = pool.stats()
+        self.assertEqual(stats['values'], 10)
+        self.assertEqual(stats['hits'] + stats['misses'], 4000)
+        self.assertEqual(stats['misses'], 10)
+
+
+if __name__ == '__main__':
+    unittest.main()